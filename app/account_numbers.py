@@ -0,0 +1,76 @@
+# backend/app/account_numbers.py
+"""Collision-free 8-digit account number allocator.
+
+Numbers come from a sequence held in `counters` ({_id: "account_number", seq}).
+Each worker reserves a block of ACCOUNT_NUMBER_BLOCK sequence values with one
+`$inc` and hands them out from memory, so allocation never probes `accounts`
+and costs the same on an empty database as on a nearly full one.
+
+With ACCOUNT_NUMBER_PERMUTE on, sequence value i is mapped through the affine
+bijection (A*i + B) mod SPACE, so consecutive customers don't get consecutive
+numbers. Unused numbers of a block are lost on restart; that's fine at 90M.
+"""
+import asyncio
+from collections import deque
+from math import gcd
+
+from decouple import config
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.db import db
+
+LOW = 10_000_000
+SPACE = 90_000_000          # 10000000 .. 99999999
+ACCOUNT_NUMBER_BLOCK = config("ACCOUNT_NUMBER_BLOCK", default=100, cast=int)
+ACCOUNT_NUMBER_PERMUTE = config("ACCOUNT_NUMBER_PERMUTE", default=True, cast=bool)
+_A = 48_271                 # coprime with SPACE, so i -> A*i+B is a permutation
+_B = 12_345_677
+assert gcd(_A, SPACE) == 1
+
+_pool = deque()
+_lock = asyncio.Lock()
+
+
+def _to_number(seq: int) -> str:
+    if ACCOUNT_NUMBER_PERMUTE:
+        seq = (_A * seq + _B) % SPACE
+    return str(LOW + seq)
+
+
+async def _reserve_block() -> None:
+    c = await db["counters"].find_one_and_update(
+        {"_id": "account_number"},
+        {"$inc": {"seq": ACCOUNT_NUMBER_BLOCK}},
+        upsert=True, return_document=ReturnDocument.AFTER,
+    )
+    end = c["seq"]
+    if end > SPACE:
+        raise RuntimeError("Account number space exhausted")
+    _pool.extend(range(end - ACCOUNT_NUMBER_BLOCK, end))
+
+
+async def next_account_number() -> str:
+    """Return a never-before-allocated account number."""
+    async with _lock:
+        if not _pool:
+            await _reserve_block()
+        return _to_number(_pool.popleft())
+
+
+async def insert_account(doc: dict) -> str:
+    """Insert `doc` into `accounts` with a freshly allocated account_number.
+
+    A duplicate key can only come from a legacy random number that the sequence
+    happens to land on; the next number is taken without another lookup.
+    """
+    for _ in range(5):
+        doc["account_number"] = await next_account_number()
+        try:
+            await db["accounts"].insert_one(doc)
+            return doc["account_number"]
+        except DuplicateKeyError as e:
+            if "account_number" not in str(e):
+                raise
+            doc.pop("_id", None)
+    raise RuntimeError("Could not allocate an unused account number")
@@ -0,0 +1,102 @@
+# backend/app/amortization.py
+"""Vectorized EMI and amortization schedules (NumPy).
+
+Same formula as loans.calc_emi, evaluated over whole arrays: one call prices a
+100k-loan portfolio. Schedules use the closed form for the outstanding balance
+after k payments,
+
+    B_k = P (1+r)^k - EMI ((1+r)^k - 1) / r        (B_k = P - EMI k when r == 0)
+
+so every month of every loan is computed at once instead of in a Python loop.
+The EMI is rounded to paise like calc_emi; the last instalment absorbs the
+rounding residue so each schedule ends at exactly zero.
+"""
+from typing import List
+
+import numpy as np
+
+
+def round_paise(x: np.ndarray) -> np.ndarray:
+    """np.round(x, 2), but identical to Python's round(x, 2) (which calc_emi uses).
+
+    np.round scales by 100 first, so values sitting on a half-paisa can round
+    the other way; those few are re-rounded with the builtin.
+    """
+    out = np.round(x, 2)
+    frac = np.abs(x * 100 - np.floor(x * 100) - 0.5)
+    for i in np.flatnonzero(frac < 1e-6):
+        out.flat[i] = round(float(x.flat[i]), 2)
+    return out
+
+
+def monthly_rate(apr):
+    return np.asarray(apr, dtype=np.float64) / 100 / 12
+
+
+def emi_vector(p, apr, n) -> np.ndarray:
+    """EMIs for arrays of principal, APR (%) and tenure (months)."""
+    p = np.asarray(p, dtype=np.float64)
+    n = np.asarray(n, dtype=np.int64)
+    r = monthly_rate(apr)
+    g = np.power(1 + r, n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        emi = np.where(r == 0, p / n, p * r * g / (g - 1))
+    return round_paise(emi)
+
+
+def schedule_matrix(p, apr, n):
+    """Month-by-month breakdown for many loans at once.
+
+    Returns (emi, payment, interest, principal, balance), the last four shaped
+    (loans, max(n)); cells past a loan's own tenure are NaN.
+    """
+    p = np.asarray(p, dtype=np.float64)
+    n = np.asarray(n, dtype=np.int64)
+    r = monthly_rate(apr)
+    emi = emi_vector(p, apr, n)
+
+    k = np.arange(0, int(n.max()) + 1, dtype=np.float64)[None, :]   # 0..max(n)
+    g = np.power(1 + r[:, None], k)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bal = np.where(r[:, None] == 0,
+                       p[:, None] - emi[:, None] * k,
+                       p[:, None] * g - emi[:, None] * (g - 1) / r[:, None])
+    opening, closing = bal[:, :-1], bal[:, 1:]
+    interest = opening * r[:, None]
+    principal = emi[:, None] - interest
+
+    months = k[:, 1:]
+    last = months == n[:, None]
+    # final instalment clears whatever is left after rounding the EMI
+    principal = np.where(last, opening, principal)
+    payment = principal + interest
+    closing = np.where(last, 0.0, closing)
+
+    live = months <= n[:, None]
+    nan = np.nan
+    return (
+        emi,
+        np.round(np.where(live, payment, nan), 2),
+        np.round(np.where(live, interest, nan), 2),
+        np.round(np.where(live, principal, nan), 2),
+        np.round(np.where(live, closing, nan), 2),
+    )
+
+
+def schedule_rows(payment, interest, principal, balance, months: int) -> List[dict]:
+    """One loan's rows of schedule_matrix output as JSON-friendly dicts."""
+    return [
+        {
+            "month": m + 1,
+            "payment": float(payment[m]),
+            "interest": float(interest[m]),
+            "principal": float(principal[m]),
+            "balance": float(balance[m]),
+        }
+        for m in range(months)
+    ]
+
+
+def schedule(p: float, apr: float, n: int) -> List[dict]:
+    emi, pay, intr, prin, bal = schedule_matrix([p], [apr], [n])
+    return schedule_rows(pay[0], intr[0], prin[0], bal[0], n)
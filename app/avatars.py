@@ -0,0 +1,106 @@
+# backend/app/avatars.py
+"""Content-addressed avatar storage under static/avatars.
+
+`store()` streams the request body to a temp file in static/avatars chunk by
+chunk, hashing as it goes and giving up with 413 past AVATAR_MAX_BYTES, so a
+large upload never sits in memory. The file is then renamed to
+`<sha256>.<ext>`: identical images share one file, and a name never points at
+different bytes, which is what lets app/static.py serve them as immutable.
+
+Thumbnails (`<sha256>-<size>.webp` for each AVATAR_THUMB_SIZES) are resized on a
+small thread pool after the response has gone out; their URLs are returned
+straight away because the names are deterministic.
+"""
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Optional
+from uuid import uuid4
+
+from decouple import config
+from fastapi import HTTPException
+from PIL import Image, ImageOps
+from starlette.concurrency import run_in_threadpool
+
+log = logging.getLogger(__name__)
+
+AVATAR_MAX_BYTES = config("AVATAR_MAX_BYTES", default=5 * 1024 * 1024, cast=int)
+AVATAR_THUMB_SIZES = (64, 256)
+AVATAR_THUMB_WORKERS = config("AVATAR_THUMB_WORKERS", default=2, cast=int)
+AVATAR_DIR = Path("static") / "avatars"
+URL_PREFIX = "/static/avatars"
+FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+
+_thumbs: Optional[ThreadPoolExecutor] = None
+
+
+def _sniff(path: Path) -> Optional[str]:
+    """Image format from the file's content (not its name or Content-Type)."""
+    try:
+        with Image.open(path) as img:
+            img.verify()
+            return img.format
+    except Exception:
+        return None
+
+
+def _make_thumbnails(src: Path, digest: str) -> None:
+    for size in AVATAR_THUMB_SIZES:
+        dst = AVATAR_DIR / f"{digest}-{size}.webp"
+        if dst.exists():
+            continue
+        with Image.open(src) as img:
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((size, size))
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA")
+            tmp = dst.with_name(f".{dst.name}.{uuid4().hex}")
+            img.save(tmp, "WEBP", quality=85)
+            os.replace(tmp, dst)
+
+
+def _log_failure(future) -> None:
+    if future.exception() is not None:
+        log.error("thumbnail generation failed", exc_info=future.exception())
+
+
+def urls(digest: str, ext: str) -> dict:
+    return {
+        "avatar": f"{URL_PREFIX}/{digest}.{ext}",
+        "thumbnails": {str(s): f"{URL_PREFIX}/{digest}-{s}.webp" for s in AVATAR_THUMB_SIZES},
+    }
+
+
+async def store(chunks: AsyncIterator[bytes]) -> dict:
+    """Save an uploaded image; returns its avatar and thumbnail URLs."""
+    global _thumbs
+    AVATAR_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = AVATAR_DIR / f".upload-{uuid4().hex}"
+    sha, size = hashlib.sha256(), 0
+    try:
+        with open(tmp, "wb") as out:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > AVATAR_MAX_BYTES:
+                    raise HTTPException(413, f"Avatar larger than {AVATAR_MAX_BYTES} bytes")
+                sha.update(chunk)
+                out.write(chunk)
+        if not size:
+            raise HTTPException(400, "Empty upload")
+        fmt = await run_in_threadpool(_sniff, tmp)
+        if fmt not in FORMATS:
+            raise HTTPException(400, "Avatar must be a JPEG, PNG, WebP or GIF image")
+        digest = sha.hexdigest()
+        final = AVATAR_DIR / f"{digest}.{FORMATS[fmt]}"
+        if not final.exists():          # same bytes already stored: keep the one copy
+            os.replace(tmp, final)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+    if _thumbs is None:
+        _thumbs = ThreadPoolExecutor(AVATAR_THUMB_WORKERS, thread_name_prefix="avatar-thumbs")
+    _thumbs.submit(_make_thumbnails, final, digest).add_done_callback(_log_failure)
+    return urls(digest, FORMATS[fmt])
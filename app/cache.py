@@ -0,0 +1,124 @@
+# backend/app/cache.py
+"""In-process read-through cache for user + account profile views.
+
+Bounded by size (LRU) and age (TTL). Entries are tagged with the owner's user id
+so a profile update, deletion or balance change can drop every view of that
+user (by id and by account number) in one call. The cache is per worker; the
+TTL bounds how stale another worker's copy can be.
+
+A load that was in flight when its user was invalidated is returned but not
+cached: every invalidation stamps the tag with a generation number, and
+`set(..., since=)` skips a view read before that generation. (The tag is only
+known once the load returns, so `since` is a cache-wide generation.)
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from decouple import config
+
+PROFILE_CACHE_SIZE = config("PROFILE_CACHE_SIZE", default=10_000, cast=int)
+PROFILE_CACHE_TTL = config("PROFILE_CACHE_TTL", default=30.0, cast=float)
+
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize, self.ttl = maxsize, ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires, tag, value)
+        self._tags: dict = {}                                       # tag -> {keys}
+        self._gen = 0                                               # bumped per invalidation
+        self._invalidated: dict = {}                                # tag -> gen, while loads run
+        self._loads = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[2]
+
+    def begin_load(self) -> int:
+        """Generation to pass to `set(since=)` once the load finishes; pair with `end_load()`."""
+        self._loads += 1
+        return self._gen
+
+    def end_load(self) -> None:
+        self._loads -= 1
+        if not self._loads:
+            self._invalidated.clear()
+
+    def set(self, key: Hashable, value: Any, tag: Optional[str] = None, since: Optional[int] = None) -> None:
+        if since is not None and self._invalidated.get(tag, -1) > since:
+            return      # invalidated while it was being loaded: stale
+        if key in self._data:
+            self._drop(key)
+        self._data[key] = (time.monotonic() + self.ttl, tag, value)
+        if tag is not None:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._data) > self.maxsize:
+            self._drop(next(iter(self._data)))
+            self.evictions += 1
+
+    def invalidate_tag(self, tag: Optional[str]) -> None:
+        self._gen += 1
+        if self._loads:
+            self._invalidated[str(tag)] = self._gen
+        for key in self._tags.pop(str(tag), ()):
+            if key in self._data:
+                self._drop(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._tags.clear()
+
+    def _drop(self, key: Hashable) -> None:
+        _, tag, _ = self._data.pop(key)
+        keys = self._tags.get(tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+profile_cache = TTLCache(PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL)
+
+
+async def cached_profile(key: Hashable, load: Callable[[], Awaitable[Optional[tuple]]]) -> Optional[dict]:
+    """Return the cached view for `key`, or call `load()` -> (user_id, view) and cache it."""
+    view = profile_cache.get(key)
+    if view is not None:
+        return view
+    since = profile_cache.begin_load()
+    try:
+        loaded = await load()
+        if loaded is None:
+            return None
+        user_id, view = loaded
+        profile_cache.set(key, view, tag=str(user_id), since=since)
+        return view
+    finally:
+        profile_cache.end_load()
+
+
+def invalidate_user(user_id: Any) -> None:
+    """Drop every cached view of this user (call after any write to user/account)."""
+    profile_cache.invalidate_tag(str(user_id))
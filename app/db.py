@@ -1,8 +1,83 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-from decouple import config
-
-MONGO_URL = config("MONGO_URL")
-DB_NAME = config("DB_NAME")
-
-client = AsyncIOMotorClient(MONGO_URL)
-db = client[DB_NAME]
+# backend/app/db.py
+import asyncio
+from typing import Optional
+
+from decouple import config
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+
+from app.metrics import command_listener
+
+MONGO_URL = config("MONGO_URL", default="mongodb://localhost:27017")
+DB_NAME = config("DB_NAME", default="bank_management")
+MONGO_MAX_POOL_SIZE = config("MONGO_MAX_POOL_SIZE", default=100, cast=int)
+MONGO_MIN_POOL_SIZE = config("MONGO_MIN_POOL_SIZE", default=0, cast=int)
+MONGO_CONNECT_TIMEOUT_MS = config("MONGO_CONNECT_TIMEOUT_MS", default=5000, cast=int)
+MONGO_SERVER_SELECTION_TIMEOUT_MS = config("MONGO_SERVER_SELECTION_TIMEOUT_MS", default=5000, cast=int)
+MONGO_SOCKET_TIMEOUT_MS = config("MONGO_SOCKET_TIMEOUT_MS", default=0, cast=int)     # 0 = no timeout
+MONGO_MAX_IDLE_TIME_MS = config("MONGO_MAX_IDLE_TIME_MS", default=0, cast=int)      # 0 = keep forever
+# e.g. "zstd,snappy,zlib"; zstd needs `zstandard`, snappy `python-snappy`, zlib is built in
+MONGO_COMPRESSORS = config("MONGO_COMPRESSORS", default="")
+
+client: Optional[AsyncIOMotorClient] = None
+
+
+def client_options() -> dict:
+    """Pool / timeout / compression settings shared by the Motor and pymongo clients."""
+    opts = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS or None,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS or None,
+    }
+    if MONGO_COMPRESSORS:
+        opts["compressors"] = MONGO_COMPRESSORS
+    return opts
+
+
+def connect_db() -> AsyncIOMotorDatabase:
+    """Open the shared Motor client (called from the FastAPI lifespan)."""
+    global client
+    if client is None:
+        client = AsyncIOMotorClient(MONGO_URL, event_listeners=[command_listener], **client_options())
+    return client[DB_NAME]
+
+
+async def warm_up(n: int = MONGO_MIN_POOL_SIZE) -> int:
+    """Open `n` pooled connections now (TLS + auth + handshake) with concurrent
+    pings, so the first requests after a deploy don't pay for them. Returns how
+    many pings succeeded; raises if the server can't be reached at all."""
+    pings = [client.admin.command("ping") for _ in range(max(n, 1))]
+    results = await asyncio.gather(*pings, return_exceptions=True)
+    ok = sum(not isinstance(r, Exception) for r in results)
+    if not ok:
+        raise results[0]
+    return ok
+
+
+def close_db() -> None:
+    """Close the shared Motor client (called from the FastAPI lifespan)."""
+    global client
+    if client is not None:
+        client.close()
+        client = None
+
+
+class _Database:
+    """Module-level handle so routers can keep doing `db["users"]` / `db.users`
+    while the real client is opened and closed by the app lifespan."""
+
+    def _get(self) -> AsyncIOMotorDatabase:
+        if client is None:
+            raise RuntimeError("Mongo client is not connected; is the app lifespan running?")
+        return client[DB_NAME]
+
+    def __getitem__(self, name: str):
+        return self._get()[name]
+
+    def __getattr__(self, name: str):
+        return getattr(self._get(), name)
+
+
+db = _Database()
@@ -0,0 +1,104 @@
+# backend/app/health.py
+"""Liveness / readiness state for /healthz and /readyz.
+
+The lifespan calls `mark_ready()` once indexes exist and the Mongo pool has been
+warmed (app.db.warm_up); until then /readyz answers 503 so a load balancer
+doesn't route traffic to a process that would pay connection setup on its first
+requests. After that, readiness follows a `ping` that is cached for
+HEALTH_PING_TTL_S and shared by concurrent probes, so a probe storm costs at
+most one round trip per TTL.
+
+`startup_seconds` is measured from the process start time (from /proc where
+available, else from when this module was imported) to `mark_ready()`.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from decouple import config
+
+from app.db import db
+
+log = logging.getLogger(__name__)
+
+HEALTH_PING_TTL_S = config("HEALTH_PING_TTL_S", default=2.0, cast=float)
+HEALTH_PING_TIMEOUT_S = config("HEALTH_PING_TIMEOUT_S", default=1.0, cast=float)
+
+
+def _process_started() -> float:
+    """Wall-clock time the process started (Linux), or now."""
+    try:
+        with open(f"/proc/{os.getpid()}/stat") as f:
+            ticks = int(f.read().rsplit(")", 1)[1].split()[19])     # field 22: starttime
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+PROCESS_STARTED = _process_started()
+
+
+class _State:
+    def __init__(self):
+        self.ready_at: Optional[float] = None
+        self.warm_connections = 0
+        self.ping_ok = False
+        self.ping_error: Optional[str] = None
+        self.ping_ms: Optional[float] = None
+        self._checked = 0.0         # monotonic time of the last ping
+        self._inflight: Optional[asyncio.Task] = None
+
+    @property
+    def startup_seconds(self) -> Optional[float]:
+        return round(self.ready_at - PROCESS_STARTED, 3) if self.ready_at else None
+
+    async def _ping(self) -> None:
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(db.command("ping"), HEALTH_PING_TIMEOUT_S)
+            self.ping_ok, self.ping_error = True, None
+        except Exception as e:
+            self.ping_ok, self.ping_error = False, f"{type(e).__name__}: {e}"
+        self.ping_ms = round((time.perf_counter() - t0) * 1000, 2)
+        self._checked = time.monotonic()
+
+    async def check(self) -> bool:
+        """Whether Mongo answered a ping within the last HEALTH_PING_TTL_S."""
+        if time.monotonic() - self._checked >= HEALTH_PING_TTL_S:
+            if self._inflight is None or self._inflight.done():
+                self._inflight = asyncio.create_task(self._ping())
+            await asyncio.shield(self._inflight)
+        return self.ping_ok
+
+
+state = _State()
+
+
+def mark_ready(warm_connections: int) -> None:
+    state.ready_at = time.time()
+    state.warm_connections = warm_connections
+    state.ping_ok, state._checked = True, time.monotonic()     # warm_up just pinged
+    log.info("ready in %.3fs since process start (%d Mongo connections warmed)",
+             state.startup_seconds, warm_connections)
+
+
+def mark_stopping() -> None:
+    state.ready_at = None
+
+
+def liveness() -> dict:
+    return {"status": "ok", "uptime_seconds": round(time.time() - PROCESS_STARTED, 3)}
+
+
+async def readiness() -> dict:
+    ready = state.ready_at is not None and await state.check()
+    return {
+        "status": "ready" if ready else "not_ready",
+        "startup_seconds": state.startup_seconds,
+        "warm_connections": state.warm_connections,
+        "mongo": {"ok": state.ping_ok, "ping_ms": state.ping_ms, "error": state.ping_error},
+    }
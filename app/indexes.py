@@ -0,0 +1,102 @@
+# backend/app/indexes.py
+"""Index bootstrap for the hot-path queries in app/routes/*.
+
+Every find/sort the routers run should be backed by one of these. `ensure_indexes`
+runs from the app lifespan; `create_index` is a no-op when the index already exists.
+Indexes an entry in INDEXES replaced are listed in SUPERSEDED and dropped once
+their replacement exists, so they stop costing every write.
+"""
+import logging
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+log = logging.getLogger(__name__)
+
+# collection -> [(keys, options)]
+INDEXES = {
+    "users": [
+        ([("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+        ([("username", ASCENDING)], {"name": "username"}),
+    ],
+    "accounts": [
+        ([("account_number", ASCENDING)], {"name": "account_number_unique", "unique": True}),
+        ([("user_id", ASCENDING)], {"name": "user_id"}),
+        ([("account_type", ASCENDING), ("_id", DESCENDING)], {"name": "account_type_id"}),
+    ],
+    "transactions": [
+        ([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], {"name": "user_id_timestamp_id"}),
+    ],
+    "loans": [
+        ([("user_id", ASCENDING), ("created_at", DESCENDING)], {"name": "user_id_created_at"}),
+        ([("created_at", DESCENDING), ("_id", DESCENDING)], {"name": "created_at_id"}),
+        ([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {"name": "status_created_at_id"}),
+    ],
+    "messages": [
+        ([("user_id", ASCENDING), ("seq", DESCENDING)], {"name": "user_id_seq"}),
+    ],
+    "purge_jobs": [
+        ([("status", ASCENDING), ("_id", ASCENDING)], {"name": "status_id"}),
+    ],
+}
+
+# collection -> [index names that an entry above replaced]
+SUPERSEDED = {
+    "transactions": ["user_id_timestamp"],
+    "loans": ["created_at"],
+    "messages": ["user_id_created_at", "user_id_id"],
+}
+
+
+async def ensure_indexes(db) -> dict:
+    """Create every index in INDEXES and check it exists afterwards.
+
+    Returns {collection: {index_name: "ok" | "dropped" | "<error>"}}. A failure
+    (e.g. duplicate emails blocking the unique index) is logged and reported, not
+    raised, so the app still starts. Superseded indexes are only dropped when
+    every index of their collection was created.
+    """
+    report = {}
+    for coll, specs in INDEXES.items():
+        report[coll] = {}
+        for keys, opts in specs:
+            try:
+                await db[coll].create_index(keys, **opts)
+            except OperationFailure as e:
+                log.warning("index %s.%s not created: %s", coll, opts["name"], e)
+                report[coll][opts["name"]] = str(e)
+        existing = await db[coll].index_information()
+        for _, opts in specs:
+            if opts["name"] not in report[coll]:
+                report[coll][opts["name"]] = "ok" if opts["name"] in existing else "missing"
+        if any(v != "ok" for v in report[coll].values()):
+            continue
+        for name in SUPERSEDED.get(coll, ()):
+            if name in existing:
+                try:
+                    await db[coll].drop_index(name)
+                    report[coll][name] = "dropped"
+                except OperationFailure as e:
+                    log.warning("superseded index %s.%s not dropped: %s", coll, name, e)
+                    report[coll][name] = str(e)
+    return report
+
+
+async def index_stats(db) -> dict:
+    """$indexStats per collection: how many ops used each index since the last restart.
+
+    Indexes with `accesses.ops == 0` are dead weight; a collection with only `_id_`
+    in use means its queries are scanning.
+    """
+    out = {}
+    for coll in INDEXES:
+        rows = []
+        async for s in db[coll].aggregate([{"$indexStats": {}}]):
+            rows.append({
+                "name": s["name"],
+                "key": s["key"],
+                "ops": s["accesses"]["ops"],
+                "since": s["accesses"]["since"],
+            })
+        out[coll] = sorted(rows, key=lambda r: r["ops"])
+    return out
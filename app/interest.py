@@ -0,0 +1,200 @@
+# backend/app/interest.py
+"""Nightly interest accrual and fee engine.
+
+One run per calendar date. Accounts are streamed in _id order in chunks of
+INTEREST_CHUNK; for each chunk the day's amounts are computed over NumPy arrays
+(savings: balance * SAVINGS_RATE / 100 / 365, current: CURRENT_LOW_BALANCE_FEE
+when the balance is under CURRENT_MIN_BALANCE, never overdrawing) and applied in
+one transaction: an ordered `bulk_write` of `$inc` balance updates, the ledger
+rows via `ledger.record`, and the run's checkpoint.
+
+Ledger rows are stamped when their chunk's transaction runs, not when the run
+started, so they sort after any movement already reflected in their
+`balance_after` and land in the bucket of the period they were written in.
+Run dates in the future are refused.
+
+Idempotent per run date: every update sets `accrued_on: <date>` and only
+matches accounts whose `accrued_on` differs, and the checkpoint (last _id) in
+`interest_runs` commits with the chunk, so a crashed run resumes after the last
+committed chunk and re-running a finished date is a no-op.
+
+    python -m app.interest [--date 2026-10-17] [--chunk 5000]
+
+or POST /admin/interest/run (runs in the background; poll GET /admin/interest/runs/{date}).
+"""
+import asyncio
+import logging
+import time
+from datetime import date, datetime
+from typing import Dict, Optional
+
+import numpy as np
+from decouple import config
+from pymongo import UpdateOne
+
+from app import ledger
+from app.amortization import round_paise
+from app.cache import invalidate_user
+from app.db import db
+from app.ledger import tx_doc
+from app.lookups import LIVE
+from app.stats import bump
+
+log = logging.getLogger(__name__)
+
+SAVINGS_RATE = config("SAVINGS_RATE", default=3.5, cast=float)                  # % p.a.
+CURRENT_MIN_BALANCE = config("CURRENT_MIN_BALANCE", default=1000.0, cast=float)
+CURRENT_LOW_BALANCE_FEE = config("CURRENT_LOW_BALANCE_FEE", default=0.0, cast=float)  # per day, 0 = off
+INTEREST_CHUNK = config("INTEREST_CHUNK", default=5000, cast=int)
+
+
+class _ConcurrentRun(Exception):
+    """Another runner accrued part of the chunk first; re-read it."""
+
+
+def accrue(balances: np.ndarray, savings: np.ndarray) -> np.ndarray:
+    """Signed balance change per account for one day (credit > 0, fee < 0)."""
+    interest = np.where(savings & (balances > 0), round_paise(balances * SAVINGS_RATE / 100 / 365), 0.0)
+    fee = np.where(~savings & (balances < CURRENT_MIN_BALANCE),
+                   np.minimum(CURRENT_LOW_BALANCE_FEE, np.maximum(balances, 0.0)), 0.0)
+    return interest - fee
+
+
+async def _apply_chunk(run_date: str, last_id, chunk: int):
+    """Accrue the next chunk after `last_id`; returns (scanned, last _id, stats increments, changed users)."""
+    async def run(session):
+        at = datetime.utcnow()
+        q = {"accrued_on": {"$ne": run_date}, **LIVE}
+        if last_id is not None:
+            q["_id"] = {"$gt": last_id}
+        accs = await db["accounts"].find(
+            q, {"user_id": 1, "account_type": 1, "balance": 1}, session=session,
+        ).sort("_id", 1).limit(chunk).to_list(length=chunk)
+        if not accs:
+            return 0, last_id, {}, []
+        balances = np.array([float(a.get("balance", 0)) for a in accs])
+        savings = np.array([(a.get("account_type") or "savings") == "savings" for a in accs])
+        deltas = accrue(balances, savings)
+
+        ops = [UpdateOne({"_id": a["_id"], "accrued_on": {"$ne": run_date}},
+                         {"$inc": {"balance": float(d)}, "$set": {"accrued_on": run_date}})
+               for a, d in zip(accs, deltas)]
+        res = await db["accounts"].bulk_write(ops, ordered=True, session=session)
+        if res.matched_count != len(ops):
+            raise _ConcurrentRun()
+
+        rows, inc = [], {}
+        for a, bal, d in zip(accs, balances, deltas):
+            if d == 0:
+                continue
+            kind, key = ("interest", "interest") if d > 0 else ("fee", "fees")
+            rows.append(tx_doc(a["user_id"], kind, abs(float(d)), float(bal + d), timestamp=at))
+            inc[f"money.{key}.count"] = inc.get(f"money.{key}.count", 0) + 1
+            inc[f"money.{key}.amount"] = inc.get(f"money.{key}.amount", 0) + abs(float(d))
+            t = f"accounts.{a.get('account_type') or 'savings'}.balance"
+            inc[t] = inc.get(t, 0) + float(d)
+        await ledger.record(rows, session=session)
+
+        new_last = accs[-1]["_id"]
+        await db["interest_runs"].update_one(
+            {"_id": run_date},
+            {"$set": {"last_id": new_last, "updated_at": datetime.utcnow()},
+             "$inc": {"accounts": len(accs), "credited": inc.get("money.interest.amount", 0.0),
+                      "fees": inc.get("money.fees.amount", 0.0), "ledger_rows": len(rows)}},
+            session=session,
+        )
+        return len(accs), new_last, inc, [r["user_id"] for r in rows]
+
+    for _ in range(3):
+        try:
+            async with await db.client.start_session() as session:
+                return await session.with_transaction(run)
+        except _ConcurrentRun:
+            continue
+    raise RuntimeError("interest chunk kept colliding with a concurrent run")
+
+
+def _run_day(run_date: Optional[date]) -> str:
+    today = datetime.utcnow().date()
+    if run_date is not None and run_date > today:
+        raise ValueError(f"run date {run_date} is in the future")
+    return (run_date or today).isoformat()
+
+
+async def run(run_date: Optional[date] = None, chunk: int = INTEREST_CHUNK) -> dict:
+    """Accrue interest and fees for `run_date` (default: today, UTC) and return the run document."""
+    day = _run_day(run_date)
+    at = datetime.utcnow()
+    runs = db["interest_runs"]
+    await runs.update_one(
+        {"_id": day},
+        {"$setOnInsert": {"status": "running", "started_at": at, "last_id": None, "accounts": 0,
+                          "credited": 0.0, "fees": 0.0, "ledger_rows": 0,
+                          "savings_rate": SAVINGS_RATE}},
+        upsert=True,
+    )
+    state = await runs.find_one({"_id": day})
+    if state["status"] == "done":
+        return state
+    await runs.update_one({"_id": day}, {"$unset": {"error": ""}})
+
+    t0, scanned, last_id = time.perf_counter(), 0, state["last_id"]
+    while True:
+        n, last_id, inc, changed = await _apply_chunk(day, last_id, chunk)
+        if not n:
+            break
+        scanned += n
+        await bump(inc)
+        for u in changed:
+            invalidate_user(u)
+        elapsed = time.perf_counter() - t0
+        await runs.update_one({"_id": day}, {"$set": {"accounts_per_sec": round(scanned / elapsed, 1)}})
+
+    elapsed = time.perf_counter() - t0
+    await runs.update_one({"_id": day}, {"$set": {
+        "status": "done", "finished_at": datetime.utcnow(), "seconds": round(elapsed, 3),
+        "accounts_per_sec": round(scanned / elapsed, 1) if scanned and elapsed else None,
+    }})
+    return await runs.find_one({"_id": day})
+
+
+_tasks: Dict[str, asyncio.Task] = {}
+
+
+async def _run_logged(run_date: date, chunk: int) -> None:
+    try:
+        await run(run_date, chunk)
+    except Exception as e:
+        log.exception("interest run %s failed; it resumes from its checkpoint when restarted", run_date)
+        await db["interest_runs"].update_one({"_id": run_date.isoformat()}, {"$set": {"error": str(e)}})
+
+
+def start(run_date: Optional[date] = None, chunk: int = INTEREST_CHUNK) -> str:
+    """Start `run` in the background of this process (one task per date).
+    Raises ValueError for a run date in the future."""
+    day = _run_day(run_date)
+    task = _tasks.get(day)
+    if task is None or task.done():
+        _tasks[day] = asyncio.create_task(_run_logged(date.fromisoformat(day), chunk))
+    return day
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.db import connect_db, close_db
+
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--date", type=date.fromisoformat, help="run date, YYYY-MM-DD (default: today UTC)")
+    p.add_argument("--chunk", type=int, default=INTEREST_CHUNK)
+    args = p.parse_args()
+
+    async def _main():
+        connect_db()
+        try:
+            r = await run(args.date, args.chunk)
+            print(f"{r['_id']}: {r['status']}, {r['accounts']} accounts, credited {r['credited']:.2f}, "
+                  f"fees {r['fees']:.2f}, {r.get('accounts_per_sec')} accounts/s")
+        finally:
+            close_db()
+
+    asyncio.run(_main())
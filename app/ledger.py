@@ -0,0 +1,175 @@
+# backend/app/ledger.py
+"""Ledger rows and their monthly buckets.
+
+Every balance movement is written twice by `record()`:
+  * one flat row in `transactions` (history paging, stats, purge), and
+  * one `$push`/`$inc` upsert into `ledger_buckets`, one document per user per
+    period (LEDGER_BUCKET=month, or day for very busy accounts), e.g.
+
+      {_id: "<user_id>:2026-10", user_id, period: "2026-10", opening, net,
+       credits, debits, count, entries: [{type, amount, balance_after, timestamp, ...}]}
+
+A bucket holds at most LEDGER_BUCKET_MAX_ENTRIES entries, well under the 16 MB
+document limit; a busy period rolls over to "<user_id>:2026-10#0001", "#0002",
+... with the same fields. The string _id sorts by period and then by rollover,
+so an as-of balance reads one bucket and a statement the few of its periods, by
+_id range, instead of walking the user's history; the collection needs no
+secondary index. `opening` is set by the write that creates the bucket, which
+is only right if movements are recorded in balance order, so callers update
+the balance and call `record()` in one transaction. closing = opening + net.
+`python -m app.migrate_ledger` (re)builds buckets from `transactions`, which
+stays the source of truth.
+"""
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from decouple import config
+from pymongo import UpdateOne
+
+from app.db import db
+
+LEDGER_BUCKET = config("LEDGER_BUCKET", default="month")
+PERIOD_FORMAT = {"month": "%Y-%m", "day": "%Y-%m-%d"}[LEDGER_BUCKET]
+LEDGER_BUCKET_MAX_ENTRIES = config("LEDGER_BUCKET_MAX_ENTRIES", default=1000, cast=int)
+LAST = "~"      # sorts after any "#<seq>" rollover suffix: bucket_id(...) + LAST bounds a period
+
+# sign of each movement on the owner's balance
+SIGN = {"deposit": 1, "withdraw": -1, "transfer_in": 1, "transfer_out": -1, "emi_payment": -1,
+        "interest": 1, "fee": -1}
+
+
+def tx_doc(user_id: ObjectId, tx_type: str, amount: float, balance_after: float,
+           counterparty: Optional[ObjectId] = None, timestamp: Optional[datetime] = None) -> dict:
+    """One row of the `transactions` collection (see transactions.log_tx)."""
+    return {
+        "user_id": user_id,   # users._id (ObjectId), see app/lookups.py
+        "type": tx_type,
+        "amount": float(amount),
+        "balance_after": float(balance_after),
+        "counterparty_user_id": counterparty,
+        "timestamp": timestamp or datetime.utcnow(),
+    }
+
+
+def period(ts: datetime) -> str:
+    return ts.strftime(PERIOD_FORMAT)
+
+
+def bucket_id(user_id, ts: datetime) -> str:
+    """_id of the period's first bucket; rollovers append "#0001", "#0002", ..."""
+    return f"{user_id}:{period(ts)}"
+
+
+def next_bucket_id(bid: str) -> str:
+    base, _, seq = bid.partition("#")
+    return f"{base}#{int(seq or 0) + 1:04d}"
+
+
+def delta(tx: dict) -> float:
+    return SIGN[tx["type"]] * float(tx["amount"])
+
+
+def entry(tx: dict) -> dict:
+    """The bucket-array form of a `transactions` row."""
+    e = {"tx_id": tx["_id"], "type": tx["type"], "amount": tx["amount"],
+         "balance_after": tx["balance_after"], "timestamp": tx["timestamp"]}
+    if tx.get("counterparty_user_id") is not None:
+        e["counterparty_user_id"] = tx["counterparty_user_id"]
+    return e
+
+
+def _bucket_update(tx: dict) -> dict:
+    d = delta(tx)
+    return {
+        "$push": {"entries": entry(tx)},
+        "$inc": {"count": 1, "net": d, "credits" if d > 0 else "debits": abs(d)},
+        "$setOnInsert": {"user_id": tx["user_id"], "period": period(tx["timestamp"]),
+                         "opening": tx["balance_after"] - d},
+    }
+
+
+def bucket_op(tx: dict, bid: str) -> UpdateOne:
+    return UpdateOne({"_id": bid}, _bucket_update(tx), upsert=True)
+
+
+async def _tails(keys, session=None) -> Dict[str, tuple]:
+    """(_id, count) of the newest bucket of each period, in one query."""
+    tails = {}
+    q = {"$or": [{"_id": {"$gte": k, "$lt": k + LAST}} for k in keys]}
+    async for b in db["ledger_buckets"].find(q, {"count": 1}, session=session):
+        k = b["_id"].partition("#")[0]
+        if k not in tails or b["_id"] > tails[k][0]:
+            tails[k] = (b["_id"], b.get("count", 0))
+    return tails
+
+
+async def record(txs: List[dict], session=None) -> None:
+    """Insert ledger rows into `transactions` and append them to their buckets.
+
+    A single row (deposit, withdrawal, EMI) is appended by one count-guarded
+    update to the newest bucket of its period that still has room; only when
+    that matches nothing (first movement of the period, or the bucket is full)
+    does it fall back to reading the period's tail and upserting the next
+    bucket, which is also how batches are appended. Pass the session of the
+    transaction that changed the balance: the append then conflicts with any
+    concurrent append to the same bucket, so buckets fill in balance order and
+    never exceed LEDGER_BUCKET_MAX_ENTRIES.
+    """
+    if not txs:
+        return
+    if len(txs) == 1:
+        await db["transactions"].insert_one(txs[0], session=session)
+        key = bucket_id(txs[0]["user_id"], txs[0]["timestamp"])
+        appended = await db["ledger_buckets"].find_one_and_update(
+            {"_id": {"$gte": key, "$lt": key + LAST}, "count": {"$lt": LEDGER_BUCKET_MAX_ENTRIES}},
+            _bucket_update(txs[0]), projection={"_id": 1}, sort=[("_id", -1)], session=session,
+        )
+        if appended:
+            return
+    else:
+        await db["transactions"].insert_many(txs, ordered=False, session=session)
+    tails = await _tails({bucket_id(t["user_id"], t["timestamp"]) for t in txs}, session=session)
+    ops = []
+    for t in txs:
+        key = bucket_id(t["user_id"], t["timestamp"])
+        bid, count = tails.get(key, (key, 0))
+        if count >= LEDGER_BUCKET_MAX_ENTRIES:
+            bid, count = next_bucket_id(bid), 0
+        tails[key] = (bid, count + 1)
+        ops.append(bucket_op(t, bid))
+    # ordered: two rows for the same new bucket must not race each other's upsert
+    await db["ledger_buckets"].bulk_write(ops, ordered=True, session=session)
+
+
+def month_bounds(month: str):
+    """"2026-10" -> (2026-10-01 00:00, 2026-11-01 00:00), end exclusive."""
+    y, m = map(int, month.split("-"))
+    return datetime(y, m, 1), datetime(y + m // 12, m % 12 + 1, 1)
+
+
+def closing(bucket: dict) -> float:
+    return bucket["opening"] + bucket["net"]
+
+
+async def buckets(user_id: ObjectId, start: datetime, end: datetime) -> List[dict]:
+    """The user's buckets for the periods from `start` to `end` inclusive, oldest first."""
+    q = {"_id": {"$gte": bucket_id(user_id, start), "$lt": bucket_id(user_id, end) + LAST}}
+    return await db["ledger_buckets"].find(q).sort("_id", 1).to_list(length=None)
+
+
+async def balance_as_of(user_id: ObjectId, at: datetime) -> float:
+    """Balance right after the last movement at or before `at` (0.0 if none)."""
+    if at.tzinfo is not None:       # stored timestamps are naive UTC
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    cur = db["ledger_buckets"].find(
+        {"_id": {"$gte": f"{user_id}:", "$lt": bucket_id(user_id, at) + LAST}}
+    ).sort("_id", -1).limit(1)
+    async for b in cur:
+        if b["period"] < period(at):
+            return closing(b)
+        before = [e for e in b["entries"] if e["timestamp"] <= at]
+        if not before:      # every entry of this (rollover) bucket is later
+            return b["opening"]
+        return max(before, key=lambda e: (e["timestamp"], e["tx_id"]))["balance_after"]
+    return 0.0
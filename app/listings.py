@@ -0,0 +1,103 @@
+# backend/app/listings.py
+"""Paged, projected and streaming collection listings for the admin console.
+
+`listing()` serves one of three shapes from the same query:
+  * json   - one keyset page (`limit` rows + `next_cursor`), see app/pagination.py
+  * ndjson - every matching row, one JSON object per line
+  * csv    - every matching row, header from the projected fields
+The streaming shapes write rows as the Mongo cursor yields them, so memory
+stays flat however large the collection is. json and ndjson rows are fetched as
+RawBSONDocument and encoded straight by app/responses.py (fields missing from a
+document are omitted); csv needs a fixed column set, so it goes through row_view.
+"""
+import csv
+import io
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.db import db
+from app.pagination import encode_cursor, keyset_filter
+from app.responses import RAW, BSONResponse, dumps
+
+STREAM_BATCH = 1000
+
+
+def parse_fields(fields: Optional[str], allowed: List[str]) -> List[str]:
+    """`fields=a,b` -> validated list; default is every allowed field."""
+    if not fields:
+        return list(allowed)
+    wanted = [f.strip() for f in fields.split(",") if f.strip()]
+    bad = [f for f in wanted if f not in allowed]
+    if bad:
+        raise HTTPException(400, f"Unknown or forbidden fields: {', '.join(bad)}")
+    return wanted
+
+
+def created_range(q: dict, field: str, start: Optional[datetime], end: Optional[datetime]) -> dict:
+    """Add a created-at range; on `_id` it is translated to ObjectId bounds."""
+    if not (start or end):
+        return q
+    cond = {}
+    if start: cond["$gte"] = ObjectId.from_datetime(start) if field == "_id" else start
+    if end:   cond["$lt"] = ObjectId.from_datetime(end) if field == "_id" else end
+    return {**q, field: cond}
+
+
+def _plain(v):
+    if isinstance(v, ObjectId):
+        return str(v)
+    if isinstance(v, datetime):
+        return v.isoformat()
+    return v
+
+
+def row_view(doc: dict, fields: Iterable[str]) -> dict:
+    out = {"_id": str(doc["_id"])}
+    for f in fields:
+        out[f] = _plain(doc.get(f))
+    return out
+
+
+async def listing(coll: str, key: str, q: dict, sort_field: str, fields: List[str],
+                  limit: int, cursor: Optional[str], fmt: str):
+    projection = {f: 1 for f in fields}
+    sort = [("_id", -1)] if sort_field == "_id" else [(sort_field, -1), ("_id", -1)]
+    if sort_field != "_id":
+        projection[sort_field] = 1      # needed for the next cursor
+
+    raw = db[coll].with_options(codec_options=RAW)
+    if fmt == "ndjson":
+        async def body():
+            async for d in raw.find(q, projection).sort(sort).batch_size(STREAM_BATCH):
+                yield dumps(d) + b"\n"
+        return StreamingResponse(body(), media_type="application/x-ndjson")
+
+    if fmt == "csv":
+        cur = db[coll].find(q, projection).sort(sort).batch_size(STREAM_BATCH)
+
+        async def body():
+            buf = io.StringIO()
+            w = csv.DictWriter(buf, fieldnames=["_id", *fields], extrasaction="ignore")
+            w.writeheader()
+            async for d in cur:
+                w.writerow(row_view(d, fields))
+                if buf.tell() > 64 * 1024:
+                    yield buf.getvalue()
+                    buf.seek(0); buf.truncate()
+            yield buf.getvalue()
+        return StreamingResponse(body(), media_type="text/csv",
+                                 headers={"Content-Disposition": f'attachment; filename="{key}.csv"'})
+
+    after = keyset_filter(sort_field, cursor)
+    docs = await raw.find({"$and": [q, after]} if after else q, projection) \
+        .sort(sort).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(sort_field) if sort_field != "_id" else last["_id"], last["_id"])
+    return BSONResponse({"count": len(docs), key: docs, "next_cursor": next_cursor})
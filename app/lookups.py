@@ -0,0 +1,43 @@
+# backend/app/lookups.py
+"""Typed id handling and single-query lookups shared by all routers.
+
+Canonical storage (enforced by `python -m app.migrate_ids`):
+  * users._id and every `user_id` / `counterparty_user_id` -> ObjectId
+  * every `account_number`                                  -> 8-digit str
+
+Callers convert the path/body value once with `oid()` and then run exactly one
+indexed query, instead of trying ObjectId, str and int variants in turn.
+
+A closed customer's user and account documents carry `deleted_at` until the
+purge job (app/purge.py) removes them; every lookup adds LIVE so they read as
+missing from the moment the customer is closed.
+"""
+from typing import Optional
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.db import db
+
+LIVE = {"deleted_at": None}     # matches documents without the field
+
+
+def oid(s, label: str = "id") -> ObjectId:
+    if isinstance(s, ObjectId):
+        return s
+    try:
+        return ObjectId((s or "").strip())
+    except Exception:
+        raise HTTPException(400, f"Invalid {label} format")
+
+
+async def find_user(user_id, projection: Optional[dict] = None):
+    return await db["users"].find_one({"_id": oid(user_id, "user_id"), **LIVE}, projection)
+
+
+async def find_account_by_user(user_id, projection: Optional[dict] = None):
+    return await db["accounts"].find_one({"user_id": oid(user_id, "user_id"), **LIVE}, projection)
+
+
+async def find_account_by_number(account_number, projection: Optional[dict] = None):
+    return await db["accounts"].find_one({"account_number": str(account_number).strip(), **LIVE}, projection)
@@ -0,0 +1,208 @@
+# backend/app/metrics.py
+"""Per-route latency and Mongo command metrics, exposed at GET /metrics.
+
+`MetricsMiddleware` times every HTTP request and records a latency histogram and
+status counts per route template (`/users/{user_id}`, never the raw path), plus
+an in-flight gauge. `CommandListener` is registered on the Motor client
+(app/db.py) and gets pymongo's command-monitoring events. Motor runs each
+command on its executor with a copy of the caller's context, so the listener
+finds the issuing request's `RequestStats` through a contextvar and charges the
+command count and server time to that route.
+
+`render()` writes everything in the Prometheus text format. With SLOW_REQUEST_MS
+set, requests slower than that are logged with their per-command breakdown.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from decouple import config
+from pymongo import monitoring
+
+log = logging.getLogger(__name__)
+
+SLOW_REQUEST_MS = config("SLOW_REQUEST_MS", default=0, cast=int)  # 0 = off
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestStats:
+    """Mongo commands issued while serving one request."""
+
+    __slots__ = ("commands", "seconds", "by_command")
+
+    def __init__(self):
+        self.commands = 0
+        self.seconds = 0.0
+        self.by_command: Dict[str, list] = defaultdict(lambda: [0, 0.0])
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, le in enumerate(BUCKETS):
+            if value <= le:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()  # the listener runs on Motor's executor threads
+        self.in_flight = 0
+        self.latency: Dict[tuple, Histogram] = defaultdict(Histogram)
+        self.responses: Dict[tuple, int] = defaultdict(int)
+        self.route_commands: Dict[tuple, int] = defaultdict(int)
+        self.route_mongo_seconds: Dict[tuple, float] = defaultdict(float)
+        self.commands: Dict[tuple, int] = defaultdict(int)
+        self.command_seconds: Dict[str, float] = defaultdict(float)
+
+    def command(self, name: str, seconds: float, ok: bool) -> None:
+        stats = _current.get()
+        with self._lock:
+            self.commands[(name, "ok" if ok else "error")] += 1
+            self.command_seconds[name] += seconds
+            if stats is not None:
+                stats.commands += 1
+                stats.seconds += seconds
+                entry = stats.by_command[name]
+                entry[0] += 1
+                entry[1] += seconds
+
+    def request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        with self._lock:
+            key = (method, route)
+            self.latency[key].observe(seconds)
+            self.responses[(method, route, str(status))] += 1
+            self.route_commands[key] += stats.commands
+            self.route_mongo_seconds[key] += stats.seconds
+
+    def render(self) -> str:
+        out = []
+
+        def family(name, kind, help_):
+            out.append(f"# HELP {name} {help_}")
+            out.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            family("http_requests_in_flight", "gauge", "Requests currently being served.")
+            out.append(f"http_requests_in_flight {self.in_flight}")
+
+            family("http_request_duration_seconds", "histogram", "Request latency by route.")
+            for (method, route), h in sorted(self.latency.items()):
+                labels = f'method="{method}",route="{route}"'
+                cumulative = 0
+                for le, n in zip(BUCKETS, h.counts):
+                    cumulative += n
+                    out.append(f'http_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                out.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {h.total}')
+                out.append(f"http_request_duration_seconds_sum{{{labels}}} {h.sum:.6f}")
+                out.append(f"http_request_duration_seconds_count{{{labels}}} {h.total}")
+
+            family("http_responses_total", "counter", "Responses by route and status code.")
+            for (method, route, status), n in sorted(self.responses.items()):
+                out.append(f'http_responses_total{{method="{method}",route="{route}",status="{status}"}} {n}')
+
+            family("http_request_mongo_commands_total", "counter", "Mongo commands issued while serving the route.")
+            for (method, route), n in sorted(self.route_commands.items()):
+                out.append(f'http_request_mongo_commands_total{{method="{method}",route="{route}"}} {n}')
+
+            family("http_request_mongo_seconds_total", "counter", "Mongo server time spent while serving the route.")
+            for (method, route), s in sorted(self.route_mongo_seconds.items()):
+                out.append(f'http_request_mongo_seconds_total{{method="{method}",route="{route}"}} {s:.6f}')
+
+            family("mongo_commands_total", "counter", "Mongo commands by name and outcome.")
+            for (name, outcome), n in sorted(self.commands.items()):
+                out.append(f'mongo_commands_total{{command="{name}",outcome="{outcome}"}} {n}')
+
+            family("mongo_command_seconds_total", "counter", "Mongo server time by command name.")
+            for name, s in sorted(self.command_seconds.items()):
+                out.append(f'mongo_command_seconds_total{{command="{name}"}} {s:.6f}')
+
+        return "\n".join(out) + "\n"
+
+
+registry = Registry()
+
+
+class CommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        registry.command(event.command_name, event.duration_micros / 1e6, True)
+
+    def failed(self, event):
+        registry.command(event.command_name, event.duration_micros / 1e6, False)
+
+
+command_listener = CommandListener()
+
+
+def route_template(scope) -> str:
+    """`/users/{user_id}` for `/users/64f0...`: the matched route's `path_format`
+    under whatever prefix the router was included with. Everything a Mount
+    serves shares one `<mount>/{path}` label, and unmatched paths share another,
+    so neither static files nor 404 scans can blow up label cardinality."""
+    if "endpoint" not in scope:
+        return "unmatched"
+    fmt = getattr(scope.get("route"), "path_format", None)
+    if fmt is None:                     # Mount (e.g. /static): no route in scope
+        return scope.get("root_path", "") + "/{path}"
+    prefix = scope["path"].rsplit("/", fmt.count("/"))[0]
+    return prefix + fmt
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed responses are timed to their last byte."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        registry.in_flight += 1
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - t0
+            registry.in_flight -= 1
+            _current.reset(token)
+            registry.request(scope["method"], route_template(scope), status, elapsed, stats)
+            if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+                breakdown = ", ".join(
+                    f"{name}={n}/{s * 1000:.1f}ms" for name, (n, s) in sorted(stats.by_command.items())
+                )
+                log.warning(
+                    "slow request %s %s -> %s in %.1fms; mongo %d commands / %.1fms [%s]",
+                    scope["method"], scope["path"], status, elapsed * 1000,
+                    stats.commands, stats.seconds * 1000, breakdown,
+                )
+
+
+def render() -> str:
+    return registry.render()
@@ -0,0 +1,136 @@
+# backend/app/migrate_ids.py
+"""One-shot migration to the canonical id types in app/lookups.py.
+
+    python -m app.migrate_ids [--batch 1000] [--dry-run]
+
+Historically `user_id` was a str in accounts/transactions (auth.register_user,
+transactions.log_tx) and an ObjectId in loans/messages, and account_number was
+sometimes an int. Each step selects only documents still in the legacy type and
+walks them in _id order, writing one `bulk_write` per batch, so the command is
+resumable: re-running it (after a crash or a partial run) continues where the
+previous run stopped and is a no-op once everything is converted. Moving
+users._id needs transactions (a replica set, as app/transfers.py does).
+
+A field with a unique index (accounts.account_number) can collide once
+converted: an int 1001 next to a str "1001", or 1001 next to 1001.0. Such
+documents are left unconverted and listed as conflicts (also with --dry-run)
+instead of failing the batch; resolve them by hand and re-run.
+
+Queries saved per request once converted (worst case, before -> after):
+  GET/PUT/DELETE /users/{id} ............ 4 -> 2 (user: oid+str, account: str+oid)
+  /users/{id}/password .................. 2 -> 1
+  GET/PUT/DELETE /users/by-account/{no} . 4 -> 2 (account: str+int, user: oid+str)
+  /users/by-account/{no}/password ....... 4 -> 2
+  POST /loans/apply ..................... no longer 404s for /auth/register accounts
+"""
+import argparse
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.database import db
+from app.indexes import INDEXES
+
+HEX24 = "^[0-9a-fA-F]{24}$"
+
+# (collection, field, legacy-type filter, converter)
+STEPS = [
+    ("accounts", "user_id", {"$type": "string", "$regex": HEX24}, ObjectId),
+    ("transactions", "user_id", {"$type": "string", "$regex": HEX24}, ObjectId),
+    ("transactions", "counterparty_user_id", {"$type": "string", "$regex": HEX24}, ObjectId),
+    ("loans", "user_id", {"$type": "string", "$regex": HEX24}, ObjectId),
+    ("messages", "user_id", {"$type": "string", "$regex": HEX24}, ObjectId),
+    ("accounts", "account_number", {"$type": "number"}, lambda v: str(int(v))),
+]
+
+# (collection, field) pairs behind a single-field unique index
+UNIQUE = {(coll, keys[0][0]) for coll, specs in INDEXES.items()
+          for keys, opts in specs if opts.get("unique") and len(keys) == 1}
+
+
+def collisions(coll: str, field: str, docs: list, convert) -> list:
+    """The docs of a batch whose converted value another document already holds."""
+    new = {d["_id"]: convert(d[field]) for d in docs}
+    taken = {t[field]: t["_id"] for t in db[coll].find({field: {"$in": list(set(new.values()))}}, {field: 1})}
+    out = []
+    for _id, value in new.items():
+        if taken.setdefault(value, _id) != _id:     # held by another doc, or earlier in this batch
+            out.append({"_id": _id, "value": value, "taken_by": taken[value]})
+    return out
+
+
+def migrate_field(coll: str, field: str, legacy: dict, convert, batch: int, dry_run: bool):
+    """Returns (documents converted, collisions left unconverted)."""
+    done, conflicts, last_id = 0, [], None
+    while True:
+        q = {field: legacy}
+        if last_id is not None:
+            q["_id"] = {"$gt": last_id}
+        docs = list(db[coll].find(q, {field: 1}).sort("_id", 1).limit(batch))
+        if not docs:
+            return done, conflicts
+        clash = collisions(coll, field, docs, convert) if (coll, field) in UNIQUE else []
+        skip = {c["_id"] for c in clash}
+        ops = [UpdateOne({"_id": d["_id"]}, {"$set": {field: convert(d[field])}}) for d in docs if d["_id"] not in skip]
+        if ops and not dry_run:
+            db[coll].bulk_write(ops, ordered=False)
+        done += len(ops)
+        conflicts += clash
+        last_id = docs[-1]["_id"]
+
+
+def migrate_user_ids(batch: int, dry_run: bool) -> int:
+    """users._id stored as a hex string -> same document under the ObjectId.
+
+    Per batch, one transaction deletes the string-_id documents and then inserts
+    their copies, so the copy never meets its original on the email_unique
+    index and a crash leaves each user either fully moved or untouched. A copy
+    that already exists (e.g. from an older run of this script) is kept and only
+    the string-_id document is dropped.
+    """
+    done = 0
+    while True:
+        docs = list(db["users"].find({"_id": {"$type": "string", "$regex": HEX24}}).limit(batch))
+        if not docs:
+            return done
+        if dry_run:
+            return done + db["users"].count_documents({"_id": {"$type": "string", "$regex": HEX24}})
+
+        def move(session):
+            new_ids = [ObjectId(d["_id"]) for d in docs]
+            moved = {d["_id"] for d in db["users"].find({"_id": {"$in": new_ids}}, {"_id": 1}, session=session)}
+            db["users"].delete_many({"_id": {"$in": [d["_id"] for d in docs]}}, session=session)
+            copies = [{**d, "_id": ObjectId(d["_id"])} for d in docs if ObjectId(d["_id"]) not in moved]
+            if copies:
+                db["users"].insert_many(copies, ordered=False, session=session)
+
+        with db.client.start_session() as session:
+            session.with_transaction(move)
+        done += len(docs)
+
+
+def run(batch: int = 1000, dry_run: bool = False):
+    """Returns ({step: documents converted}, {step: collisions})."""
+    report, conflicts = {"users._id": migrate_user_ids(batch, dry_run)}, {}
+    for coll, field, legacy, convert in STEPS:
+        key = f"{coll}.{field}"
+        report[key], clash = migrate_field(coll, field, legacy, convert, batch, dry_run)
+        if clash:
+            conflicts[key] = clash
+    return report, conflicts
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--batch", type=int, default=1000)
+    p.add_argument("--dry-run", action="store_true", help="count legacy documents without writing")
+    args = p.parse_args()
+    report, conflicts = run(args.batch, args.dry_run)
+    for k, n in report.items():
+        print(f"{k:40} {n:>10} {'to convert' if args.dry_run else 'converted'}")
+    for k, clash in conflicts.items():
+        print(f"\n{k}: {len(clash)} left unconverted, value already taken")
+        for c in clash:
+            print(f"  _id={c['_id']} -> {c['value']!r} (taken by _id={c['taken_by']})")
+    if conflicts:
+        raise SystemExit(1)
@@ -0,0 +1,109 @@
+# backend/app/migrate_ledger.py
+"""Build `ledger_buckets` (app/ledger.py) from the flat `transactions` collection.
+
+    python -m app.migrate_ledger [--batch 500] [--user <user_id>] [--restart]
+
+Walks `transactions` in user_id_timestamp_id index order, so rows arrive grouped
+by user and bucket with no in-memory sort of the collection, and writes each
+finished period's bucket(s) (rolled over every LEDGER_BUCKET_MAX_ENTRIES, as
+app/ledger.py does) with `ReplaceOne(upsert=True)`: re-running rebuilds rather
+than duplicates. Progress is checkpointed per completed user in
+`migrations` ({_id: "ledger_buckets", user_id}), so an interrupted run resumes
+with the next user; --restart ignores the checkpoint, --user rebuilds one
+customer (e.g. after a movement raced the rebuild of its bucket).
+"""
+import argparse
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import DeleteMany, ReplaceOne
+
+from app.database import db
+from app.ledger import LAST, LEDGER_BUCKET_MAX_ENTRIES, SIGN, bucket_id, delta, entry, next_bucket_id, period
+
+CHECKPOINT = {"_id": "ledger_buckets"}
+
+
+def build_buckets(rows: list) -> list:
+    """A period's bucket documents (the first, then its rollovers) from its
+    `transactions` rows (any order)."""
+    rows = sorted(rows, key=lambda t: (t["timestamp"], t["_id"]))
+    out, bid = [], bucket_id(rows[0]["user_id"], rows[0]["timestamp"])
+    for i in range(0, len(rows), LEDGER_BUCKET_MAX_ENTRIES):
+        part = rows[i:i + LEDGER_BUCKET_MAX_ENTRIES]
+        first = part[0]
+        deltas = [delta(t) for t in part]
+        out.append({
+            "_id": bid,
+            "user_id": first["user_id"],
+            "period": period(first["timestamp"]),
+            "opening": first["balance_after"] - deltas[0],
+            "net": sum(deltas),
+            "credits": sum(d for d in deltas if d > 0),
+            "debits": -sum(d for d in deltas if d < 0),
+            "count": len(part),
+            "entries": [entry(t) for t in part],
+        })
+        bid = next_bucket_id(bid)
+    return out
+
+
+def run(batch: int = 500, user=None, restart: bool = False) -> dict:
+    q = {"type": {"$in": list(SIGN)}}
+    if user is not None:
+        q["user_id"] = user
+    elif not restart:
+        done = db["migrations"].find_one(CHECKPOINT)
+        if done:
+            q["user_id"] = {"$gt": done["user_id"]}
+
+    report = {"rows": 0, "buckets": 0, "users": 0}
+    ops, rows, key, current_user = [], [], None, None
+
+    def add(key, rows):
+        docs = build_buckets(rows)
+        ops.extend(ReplaceOne({"_id": b["_id"]}, b, upsert=True) for b in docs)
+        # rollovers left over from an earlier build of this period
+        ops.append(DeleteMany({"_id": {"$gt": docs[-1]["_id"], "$lt": key + LAST}}))
+        report["buckets"] += len(docs)
+
+    def flush(checkpoint_user):
+        if ops:
+            db["ledger_buckets"].bulk_write(ops, ordered=False)
+            ops.clear()
+        if checkpoint_user is not None and user is None:
+            db["migrations"].update_one(CHECKPOINT, {"$set": {"user_id": checkpoint_user,
+                                                             "at": datetime.utcnow()}}, upsert=True)
+
+    cursor = db["transactions"].find(q).sort(
+        [("user_id", 1), ("timestamp", -1), ("_id", -1)]).batch_size(5000)
+    for t in cursor:
+        k = bucket_id(t["user_id"], t["timestamp"])
+        if k != key and rows:
+            add(key, rows)
+            rows = []
+        if t["user_id"] != current_user:
+            if current_user is not None:
+                report["users"] += 1
+                if len(ops) >= batch:
+                    flush(current_user)
+            current_user = t["user_id"]
+        key = k
+        rows.append(t)
+        report["rows"] += 1
+    if rows:
+        add(key, rows)
+    if current_user is not None:
+        report["users"] += 1
+    flush(current_user)
+    return report
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--batch", type=int, default=500, help="bucket writes per bulk_write")
+    p.add_argument("--user", help="rebuild a single user's buckets")
+    p.add_argument("--restart", action="store_true", help="ignore the checkpoint and rebuild everything")
+    args = p.parse_args()
+    r = run(args.batch, ObjectId(args.user) if args.user else None, args.restart)
+    print(f"{r['rows']} rows -> {r['buckets']} buckets for {r['users']} users")
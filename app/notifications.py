@@ -0,0 +1,175 @@
+# backend/app/notifications.py
+"""User notifications: persist to `messages` and push to live subscribers.
+
+`notify` is the single entry point for loan/admin messages. Once a message is
+stored, `writer` publishes it to an in-process broker, which fans it out to the
+SSE streams (GET /messages/{user_id}/stream) the user has open on this worker;
+streams on other workers pick it up from Mongo on their next poll.
+Publishing only after the insert means a client never holds an event id whose
+message a catch-up read or a `since` poll can't find yet.
+
+Clients page on `seq`, not `_id`: each stored batch takes the next range of a
+sequence in `counters` ({_id: "messages", seq}) in the same transaction as its
+`insert_many`. Batches from different workers write that one counter document,
+so they commit one after another and a message never becomes visible with a
+lower seq than one a reader has already seen.
+
+Writes are write-behind: `notify` hands the document to `writer`, which flushes
+with one `insert_many` (then publishes the batch) when NOTIFY_BATCH_SIZE
+messages are buffered or NOTIFY_FLUSH_MS has passed, and on shutdown. A hard crash can lose at most one unflushed batch of notifications
+(never balances or loans). NOTIFY_WRITE_BEHIND=false writes synchronously,
+which tests and scripts that read messages straight back should use.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from bson import ObjectId
+from decouple import config
+from pymongo import ReturnDocument
+
+from app.db import db
+
+log = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 100
+NOTIFY_WRITE_BEHIND = config("NOTIFY_WRITE_BEHIND", default=True, cast=bool)
+NOTIFY_BATCH_SIZE = config("NOTIFY_BATCH_SIZE", default=500, cast=int)
+NOTIFY_FLUSH_MS = config("NOTIFY_FLUSH_MS", default=200, cast=int)
+
+
+class Broker:
+    def __init__(self):
+        self._subs: Dict[str, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, user_id) -> asyncio.Queue:
+        q = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subs.setdefault(str(user_id), set()).add(q)
+        return q
+
+    def unsubscribe(self, user_id, q: asyncio.Queue) -> None:
+        subs = self._subs.get(str(user_id))
+        if subs:
+            subs.discard(q)
+            if not subs:
+                del self._subs[str(user_id)]
+
+    def publish(self, user_id, message: dict) -> None:
+        for q in self._subs.get(str(user_id), ()):
+            try:
+                q.put_nowait(message)
+            except asyncio.QueueFull:
+                pass  # slow client; it re-syncs from its last event id on reconnect
+
+    def subscriber_count(self) -> int:
+        return sum(len(s) for s in self._subs.values())
+
+
+broker = Broker()
+
+
+async def _insert(docs: List[dict]) -> None:
+    """Number `docs` from the `messages` sequence and store them, atomically."""
+    async def run(session):
+        c = await db["counters"].find_one_and_update(
+            {"_id": "messages"}, {"$inc": {"seq": len(docs)}},
+            upsert=True, return_document=ReturnDocument.AFTER, session=session,
+        )
+        for i, d in enumerate(docs, c["seq"] - len(docs) + 1):
+            d["seq"] = i
+        await db["messages"].insert_many(docs, ordered=False, session=session)
+
+    async with await db.client.start_session() as session:
+        await session.with_transaction(run)
+
+
+class NotificationWriter:
+    """Buffers message documents, writes them with `insert_many` and publishes
+    each batch to `broker` once it is stored."""
+
+    def __init__(self, batch_size: int, flush_ms: int, write_behind: bool):
+        self.batch_size, self.flush_interval = batch_size, flush_ms / 1000
+        self.write_behind = write_behind
+        self._buf: List[dict] = []
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = self.written = 0
+
+    def start(self) -> None:
+        if self.write_behind and self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything still buffered and stop the background task.
+
+        The task is asked to exit between flushes rather than cancelled, so an
+        `insert_many` in flight completes instead of losing its batch.
+        """
+        if self._task is not None:
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def put(self, doc: dict) -> None:
+        await self.put_many([doc])
+
+    async def put_many(self, docs: List[dict]) -> None:
+        if not docs:
+            return
+        if self._task is None:          # sync mode (or not started): write now
+            await _insert(docs)
+            self.written += len(docs)
+            self._publish(docs)
+            return
+        self._buf.extend(docs)
+        if len(self._buf) >= self.batch_size:
+            self._wake.set()
+
+    async def flush(self) -> None:
+        while self._buf:
+            batch, self._buf = self._buf[:self.batch_size], self._buf[self.batch_size:]
+            try:
+                await _insert(batch)
+            except asyncio.CancelledError:
+                self._buf[:0] = batch       # outcome unknown: retry on the next flush
+                raise
+            except Exception:
+                log.exception("dropping %d notifications after failed insert_many", len(batch))
+                continue
+            self.flushes += 1
+            self.written += len(batch)
+            self._publish(batch)
+
+    @staticmethod
+    def _publish(docs: List[dict]) -> None:
+        for d in docs:
+            broker.publish(d["user_id"], d)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+
+writer = NotificationWriter(NOTIFY_BATCH_SIZE, NOTIFY_FLUSH_MS, NOTIFY_WRITE_BEHIND)
+
+
+async def notify(user_oid: ObjectId, text: str) -> dict:
+    return (await notify_many([(user_oid, text)]))[0]
+
+
+async def notify_many(items: List[tuple]) -> List[dict]:
+    """notify() for many (user_oid, text) pairs; persisted with one insert_many."""
+    now = datetime.utcnow()
+    docs = [{"_id": ObjectId(), "user_id": u, "text": t, "created_at": now} for u, t in items]
+    await writer.put_many(docs)
+    return docs
@@ -0,0 +1,38 @@
+# backend/app/pagination.py
+"""Keyset (seek) pagination helpers shared by the list endpoints.
+
+A page is sorted on (field, _id) descending; the cursor is the (field, _id) of the
+last row served, base64-encoded so clients treat it as opaque.
+"""
+import base64
+from typing import Any, Optional, Tuple
+
+from bson import json_util
+from fastapi import HTTPException
+
+
+def encode_cursor(value: Any, _id: Any) -> str:
+    raw = json_util.dumps([value, _id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, _id = json_util.loads(raw)
+        return value, _id
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+
+def keyset_filter(field: str, cursor: Optional[str]) -> dict:
+    """Filter for rows strictly after `cursor` in (field desc, _id desc) order."""
+    if not cursor:
+        return {}
+    value, _id = decode_cursor(cursor)
+    if field == "_id":
+        return {"_id": {"$lt": _id}}
+    return {"$or": [
+        {field: {"$lt": value}},
+        {field: value, "_id": {"$lt": _id}},
+    ]}
@@ -0,0 +1,196 @@
+# backend/app/purge.py
+"""Background cascade purge for closed customers.
+
+Closing a customer (DELETE /users/{user_id}, DELETE /users/by-account/...)
+sets `deleted_at` on the user and account documents and records a job in
+`purge_jobs`, in one transaction, so every lookup 404s immediately (see LIVE in
+app/lookups.py) and a closed customer always has a job. The job, which keeps
+only the user_id (no contact details), then deletes the customer's loans,
+messages, ledger buckets, transactions and finally the account and user
+documents themselves, in batches of PURGE_BATCH _ids,
+sleeping PURGE_PAUSE_MS between batches, so a customer with millions of ledger
+rows never holds the request open or saturates writes on `transactions`.
+
+Jobs are documents, so progress is visible at GET /admin/purge-jobs/{job_id}
+and survives restarts. Each batch re-queries by user_id, so a resumed job never
+revisits rows it already removed. A worker holds a lease (PURGE_LEASE_S) on the
+job it runs, so with several app processes a job has one owner at a time; a
+crashed owner's lease expires and another process takes over. A job whose batch
+fails keeps its lease until it expires, which doubles as the retry backoff.
+
+With PURGE_WORKER=false the app only enqueues, and a separate process drains:
+
+    python -m app.purge
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from bson import ObjectId
+from decouple import config
+from pymongo import ReturnDocument
+
+from app.db import db
+from app.stats import bump
+
+log = logging.getLogger(__name__)
+
+PURGE_WORKER = config("PURGE_WORKER", default=True, cast=bool)
+PURGE_BATCH = config("PURGE_BATCH", default=1000, cast=int)
+PURGE_PAUSE_MS = config("PURGE_PAUSE_MS", default=50, cast=int)
+PURGE_LEASE_S = config("PURGE_LEASE_S", default=60, cast=int)
+PURGE_POLL_S = config("PURGE_POLL_S", default=30, cast=int)
+
+PHASES = ("loans", "messages", "ledger_buckets", "transactions", "accounts", "users")
+
+
+async def enqueue(user_id: ObjectId, session=None, **extra) -> ObjectId:
+    """Record a purge job for `user_id` and wake the worker (inside a
+    transaction, wake `queue` once it commits instead)."""
+    now = datetime.utcnow()
+    res = await db["purge_jobs"].insert_one({
+        "user_id": user_id,
+        "status": "queued",
+        "phase": PHASES[0],
+        "deleted": {p: 0 for p in PHASES},
+        "created_at": now,
+        "updated_at": now,
+        **extra,
+    }, session=session)
+    if session is None:
+        queue.wake()
+    return res.inserted_id
+
+
+async def _purge_batch(phase: str, user_id: ObjectId) -> int:
+    """Delete up to PURGE_BATCH of the user's documents in `phase`; return how many went."""
+    coll = db[phase]
+    projection = {"status": 1, "amount": 1} if phase == "loans" else {"_id": 1}
+    # buckets have no user_id index; their _id starts with "<user_id>:" (app/ledger.py)
+    if phase == "ledger_buckets":
+        q = {"_id": {"$regex": f"^{user_id}:"}}
+    elif phase == "users":
+        q = {"_id": user_id}
+    else:
+        q = {"user_id": user_id}
+    docs = await coll.find(q, projection).limit(PURGE_BATCH).to_list(PURGE_BATCH)
+    if not docs:
+        return 0
+    res = await coll.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+    if phase == "loans":
+        inc = {}
+        for loan in docs:
+            s = loan.get("status")
+            inc[f"loans.{s}.count"] = inc.get(f"loans.{s}.count", 0) - 1
+            inc[f"loans.{s}.amount"] = inc.get(f"loans.{s}.amount", 0) - float(loan.get("amount", 0))
+        await bump(inc)
+    return res.deleted_count
+
+
+async def run_job(job: dict) -> None:
+    """Run one claimed job from its recorded phase to the end."""
+    jobs = db["purge_jobs"]
+    for phase in PHASES[PHASES.index(job["phase"]):]:
+        while True:
+            n = await _purge_batch(phase, job["user_id"])
+            now = datetime.utcnow()
+            update = {"$set": {"phase": phase, "updated_at": now,
+                               "lease_until": now + timedelta(seconds=PURGE_LEASE_S)}}
+            if n:
+                update["$inc"] = {f"deleted.{phase}": n}
+            await jobs.update_one({"_id": job["_id"]}, update)
+            if n < PURGE_BATCH:
+                break
+            await asyncio.sleep(PURGE_PAUSE_MS / 1000)
+    now = datetime.utcnow()
+    await jobs.update_one({"_id": job["_id"]}, {
+        "$set": {"status": "done", "finished_at": now, "updated_at": now, "lease_until": None},
+        "$unset": {"error": ""},
+    })
+
+
+async def claim() -> Optional[dict]:
+    """Lease the oldest unfinished job nobody else holds."""
+    now = datetime.utcnow()
+    return await db["purge_jobs"].find_one_and_update(
+        {"status": {"$in": ["queued", "running"]},
+         "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]},
+        {"$set": {"status": "running", "updated_at": now,
+                  "lease_until": now + timedelta(seconds=PURGE_LEASE_S)}},
+        sort=[("_id", 1)], return_document=ReturnDocument.AFTER,
+    )
+
+
+async def run_pending() -> int:
+    """Drain every claimable job; return how many finished."""
+    done = 0
+    while (job := await claim()) is not None:
+        await run_job(job)
+        done += 1
+    return done
+
+
+class PurgeQueue:
+    """In-process worker that drains `purge_jobs` (started from the app lifespan)."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                job = await claim()
+            except Exception:
+                log.exception("could not claim a purge job")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), PURGE_POLL_S)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+            try:
+                await run_job(job)
+            except asyncio.CancelledError:
+                # shutting down: hand the job back so the next start resumes it at once
+                await db["purge_jobs"].update_one({"_id": job["_id"]}, {"$set": {"lease_until": None}})
+                raise
+            except Exception as e:
+                log.exception("purge job %s failed; retrying after its lease expires", job["_id"])
+                await db["purge_jobs"].update_one({"_id": job["_id"]}, {"$set": {"error": str(e)}})
+
+
+queue = PurgeQueue(PURGE_WORKER)
+
+
+if __name__ == "__main__":
+    from app.db import connect_db, close_db
+
+    async def _main():
+        connect_db()
+        try:
+            print(f"purged {await run_pending()} customer(s)")
+        finally:
+            close_db()
+
+    asyncio.run(_main())
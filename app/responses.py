@@ -0,0 +1,46 @@
+# backend/app/responses.py
+"""orjson response layer that understands BSON types.
+
+Routers return `BSONResponse(content)` (or use `dumps` for streaming) with raw
+Mongo documents: ObjectId is encoded by the `default` hook, datetimes natively
+by orjson (naive values are UTC and get a trailing Z), and RawBSONDocument rows
+are only decoded here, at serialization time. That replaces the per-row
+`str(_id)` / `isoformat()` rewrite plus FastAPI's jsonable_encoder + stdlib json
+double pass.
+"""
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from bson import ObjectId, decode
+from bson.codec_options import CodecOptions
+from bson.decimal128 import Decimal128
+from bson.raw_bson import RawBSONDocument
+from fastapi.responses import JSONResponse
+
+OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY
+RAW = CodecOptions(document_class=RawBSONDocument)   # pass to db[...].with_options()
+_DECODE = CodecOptions(tz_aware=False)
+
+
+def _default(o: Any):
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, RawBSONDocument):
+        return decode(o.raw, _DECODE)
+    if isinstance(o, Decimal128):
+        return float(o.to_decimal())
+    if isinstance(o, Decimal):
+        return float(o)
+    raise TypeError
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+class BSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
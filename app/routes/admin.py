@@ -1,49 +1,221 @@
-from fastapi import APIRouter, HTTPException
-from bson import ObjectId
-from app.database import db
-from datetime import datetime
-
-router = APIRouter()
-
-def oid(s: str) -> ObjectId:
-    try: return ObjectId((s or "").strip())
-    except Exception: raise HTTPException(400, "Invalid id format")
-
-@router.get("/customers")
-def customers():
-    out=[]
-    for u in db["users"].find({}, {"password":0}):
-        u["_id"]=str(u["_id"]); out.append(u)
-    return {"count": len(out), "customers": out}
-
-@router.get("/accounts")
-def accounts():
-    out=[]
-    for a in db["accounts"].find({}):
-        a["_id"]=str(a["_id"]); a["user_id"]=str(a["user_id"]); out.append(a)
-    return {"count": len(out), "accounts": out}
-
-@router.get("/loans")
-def loans():
-    out=[]
-    for l in db["loans"].find({}).sort("created_at",-1):
-        l["_id"]=str(l["_id"]); l["user_id"]=str(l["user_id"]); out.append(l)
-    return {"count": len(out), "loans": out}
-
-@router.post("/loans/{loan_id}/approve")
-def approve_loan(loan_id: str):
-    loid = oid(loan_id)
-    loan = db["loans"].find_one({"_id": loid})
-    if not loan: raise HTTPException(404, "Loan not found")
-    db["loans"].update_one({"_id": loid}, {"$set": {"status": "approved", "approved_at": datetime.utcnow()}})
-    db["messages"].insert_one({"user_id": loan["user_id"], "text": "Your loan is approved ✅", "created_at": datetime.utcnow()})
-    return {"status":"success","loan_id": loan_id, "new_status":"approved"}
-
-@router.post("/loans/{loan_id}/reject")
-def reject_loan(loan_id: str):
-    loid = oid(loan_id)
-    loan = db["loans"].find_one({"_id": loid})
-    if not loan: raise HTTPException(404, "Loan not found")
-    db["loans"].update_one({"_id": loid}, {"$set": {"status": "rejected"}})
-    db["messages"].insert_one({"user_id": loan["user_id"], "text": "Your loan is rejected ❌", "created_at": datetime.utcnow()})
-    return {"status":"success","loan_id": loan_id, "new_status":"rejected"}
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import RedirectResponse
+from pydantic import BaseModel, Field
+from bson import ObjectId
+from pymongo import UpdateOne
+from typing import List, Optional
+from app.db import db
+from app.lookups import LIVE, oid
+from app.listings import created_range, listing, parse_fields
+from app.notifications import notify, notify_many
+from app.cache import profile_cache
+from app.stats import bump, read_stats, reconcile
+from app.indexes import ensure_indexes, index_stats
+from app.responses import BSONResponse
+from app import interest, statements
+from datetime import date, datetime
+
+router = APIRouter()
+
+def status_change(loan: dict, new_status: str) -> dict:
+    old, amt = loan.get("status"), float(loan.get("amount", 0))
+    if old == new_status:
+        return {}
+    return {f"loans.{old}.count": -1, f"loans.{old}.amount": -amt,
+            f"loans.{new_status}.count": 1, f"loans.{new_status}.amount": amt}
+
+@router.get("/stats")
+async def get_stats():
+    """Dashboard totals from the sharded counters document (no collection scans)."""
+    return {"status":"success","stats": await read_stats()}
+
+@router.post("/stats/reconcile")
+async def reconcile_stats(dry_run: bool = False):
+    """Recompute the counters with aggregation pipelines and report drift."""
+    return {"status":"success", **await reconcile(apply=not dry_run)}
+
+CUSTOMER_FIELDS = ["username", "email", "dob", "phone", "address", "country", "language",
+                   "time_zone", "welcome", "created_at", "last_login"]   # never password
+ACCOUNT_FIELDS = ["user_id", "account_number", "account_type", "balance"]
+LOAN_FIELDS = ["user_id", "amount", "annual_rate", "months", "emi", "status", "emis_paid",
+               "created_at", "approved_at"]
+LIST_FORMAT = Query("json", pattern="^(json|ndjson|csv)$")
+
+@router.get("/customers")
+async def customers(limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None,
+                    fields: Optional[str] = None, created_from: Optional[datetime] = None,
+                    created_to: Optional[datetime] = None, format: str = LIST_FORMAT):
+    q = created_range(dict(LIVE), "_id", created_from, created_to)
+    return await listing("users", "customers", q, "_id", parse_fields(fields, CUSTOMER_FIELDS),
+                         limit, cursor, format)
+
+@router.get("/accounts")
+async def accounts(limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None,
+                   fields: Optional[str] = None, account_type: Optional[str] = Query(None, pattern="^(savings|current)$"),
+                   created_from: Optional[datetime] = None, created_to: Optional[datetime] = None,
+                   format: str = LIST_FORMAT):
+    q = created_range({"account_type": account_type, **LIVE} if account_type else dict(LIVE), "_id",
+                      created_from, created_to)
+    return await listing("accounts", "accounts", q, "_id", parse_fields(fields, ACCOUNT_FIELDS),
+                         limit, cursor, format)
+
+@router.get("/loans")
+async def loans(limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None,
+                fields: Optional[str] = None, status: Optional[str] = Query(None, pattern="^(pending|approved|rejected|closed)$"),
+                created_from: Optional[datetime] = None, created_to: Optional[datetime] = None,
+                format: str = LIST_FORMAT):
+    q = created_range({"status": status} if status else {}, "created_at", created_from, created_to)
+    return await listing("loans", "loans", q, "created_at", parse_fields(fields, LOAN_FIELDS),
+                         limit, cursor, format)
+
+@router.post("/loans/{loan_id}/approve")
+async def approve_loan(loan_id: str):
+    loid = oid(loan_id)
+    loan = await db["loans"].find_one({"_id": loid})
+    if not loan: raise HTTPException(404, "Loan not found")
+    await db["loans"].update_one({"_id": loid}, {"$set": {"status": "approved", "approved_at": datetime.utcnow()}})
+    await bump(status_change(loan, "approved"))
+    await notify(loan["user_id"], "Your loan is approved ✅")
+    return {"status":"success","loan_id": loan_id, "new_status":"approved"}
+
+@router.post("/loans/{loan_id}/reject")
+async def reject_loan(loan_id: str):
+    loid = oid(loan_id)
+    loan = await db["loans"].find_one({"_id": loid})
+    if not loan: raise HTTPException(404, "Loan not found")
+    await db["loans"].update_one({"_id": loid}, {"$set": {"status": "rejected"}})
+    await bump(status_change(loan, "rejected"))
+    await notify(loan["user_id"], "Your loan is rejected ❌")
+    return {"status":"success","loan_id": loan_id, "new_status":"rejected"}
+
+DECISIONS = {
+    "approve": ("approved", "Your loan is approved ✅"),
+    "reject": ("rejected", "Your loan is rejected ❌"),
+}
+
+class BulkDecision(BaseModel):
+    loan_ids: List[str] = Field(..., min_length=1, max_length=50_000)
+    decision: str = Field(..., pattern="^(approve|reject)$")
+
+@router.post("/loans/bulk-decision")
+async def bulk_decision(req: BulkDecision):
+    """Approve or reject many pending loans: one read, one bulk_write, one insert_many.
+
+    Only loans still `pending` are touched, so re-sending the same batch is safe;
+    everything else is reported as skipped with its current status.
+    """
+    new_status, text = DECISIONS[req.decision]
+    outcome, ids = {}, []
+    for s in dict.fromkeys(req.loan_ids):
+        try:
+            ids.append(ObjectId(s.strip()))
+        except Exception:
+            outcome[s] = "invalid_id"
+
+    found = {l["_id"]: l async for l in db["loans"].find({"_id": {"$in": ids}}, {"user_id": 1, "status": 1, "amount": 1})}
+    pending = []
+    for i in ids:
+        l = found.get(i)
+        if not l:
+            outcome[str(i)] = "not_found"
+        elif l["status"] != "pending":
+            outcome[str(i)] = f"skipped:{l['status']}"
+        else:
+            pending.append(i)
+
+    if pending:
+        batch = ObjectId()
+        now = datetime.utcnow()
+        update = {"status": new_status, "decision_batch": batch}
+        if new_status == "approved":
+            update["approved_at"] = now
+        res = await db["loans"].bulk_write(
+            [UpdateOne({"_id": i, "status": "pending"}, {"$set": update}) for i in pending], ordered=False
+        )
+        applied = pending
+        if res.modified_count != len(pending):
+            # someone else decided some of them in between; find out which ones were ours
+            applied = [l["_id"] async for l in db["loans"].find({"decision_batch": batch}, {"_id": 1})]
+        applied_set = set(applied)
+        for i in pending:
+            outcome[str(i)] = new_status if i in applied_set else "skipped:concurrent"
+        await notify_many([(found[i]["user_id"], text) for i in applied])
+        total = sum(float(found[i].get("amount", 0)) for i in applied)
+        await bump({"loans.pending.count": -len(applied), "loans.pending.amount": -total,
+                    f"loans.{new_status}.count": len(applied), f"loans.{new_status}.amount": total})
+
+    counts = {}
+    for v in outcome.values():
+        counts[v] = counts.get(v, 0) + 1
+    return {"status":"success","decision": req.decision, "counts": counts, "results": outcome}
+
+@router.get("/indexes")
+async def indexes():
+    return {"status":"success","indexes": await ensure_indexes(db)}
+
+@router.get("/index-stats")
+async def get_index_stats():
+    return {"status":"success","stats": await index_stats(db)}
+
+@router.get("/cache-stats")
+async def cache_stats():
+    return {"status":"success","profile_cache": profile_cache.stats()}
+
+@router.get("/purge-jobs")
+async def purge_jobs(
+    status: Optional[str] = Query(None, pattern="^(queued|running|done)$"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Most recent customer purge jobs first (see app/purge.py)."""
+    q = {"status": status} if status else {}
+    jobs = await db["purge_jobs"].find(q).sort("_id", -1).limit(limit).to_list(length=limit)
+    return BSONResponse({"status":"success","jobs": jobs})
+
+@router.get("/purge-jobs/{job_id}")
+async def purge_job(job_id: str):
+    job = await db["purge_jobs"].find_one({"_id": oid(job_id, "job_id")})
+    if not job:
+        raise HTTPException(404, "Purge job not found")
+    return BSONResponse({"status":"success","job": job})
+
+@router.post("/interest/run")
+async def run_interest(run_date: Optional[date] = None):
+    """Start the nightly interest/fee batch (app/interest.py) for `run_date` in the background."""
+    try:
+        day = interest.start(run_date)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {"status":"success","run_date": day, "progress": f"/admin/interest/runs/{day}"}
+
+@router.get("/interest/runs/{run_date}")
+async def interest_run(run_date: date):
+    r = await db["interest_runs"].find_one({"_id": run_date.isoformat()})
+    if not r:
+        raise HTTPException(404, "No interest run for that date")
+    return BSONResponse({"status":"success","run": r})
+
+@router.post("/statements")
+async def generate_statements(month: str = Query(..., pattern=r"^\d{4}-(0[1-9]|1[0-2])$"), pdf: bool = False):
+    """Write every account's statement for `month` in the background (app/statements.py)."""
+    if pdf and not statements.PDF_AVAILABLE:
+        raise HTTPException(400, "PDF statements need reportlab installed")
+    job_id = await statements.create_job(month, pdf)
+    return {"status":"success","job_id": str(job_id), "progress": f"/admin/statements/{job_id}"}
+
+@router.get("/statements/{job_id}")
+async def statement_job(job_id: str):
+    job = await db["statement_jobs"].find_one({"_id": oid(job_id, "job_id")}, {"dir": 0})
+    if not job:
+        raise HTTPException(404, "Statement job not found")
+    return BSONResponse({"status":"success","job": job})
+
+@router.get("/statements/{job_id}/{account_number}")
+async def download_statement(job_id: str, account_number: str, format: str = Query("csv", pattern="^(csv|pdf)$")):
+    """Redirect to the statement file on the /static mount."""
+    job = await db["statement_jobs"].find_one({"_id": oid(job_id, "job_id")})
+    if not job:
+        raise HTTPException(404, "Statement job not found")
+    name = f"{account_number.strip()}-{job['month']}.{format}"
+    if not (statements.OUT_DIR / job["dir"] / name).is_file():
+        raise HTTPException(404, "Statement not generated (yet)")
+    return RedirectResponse(f"/static/statements/{job['dir']}/{name}")
@@ -1,129 +1,132 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, EmailStr
-from app.database import db
-import random
-
-router = APIRouter()
-
-class RegisterRequest(BaseModel):
-    username: str
-    email: EmailStr
-    password: str
-
-class LoginRequest(BaseModel):
-    email: EmailStr
-    password: str
-
-class ForgotPasswordRequest(BaseModel):
-    email: EmailStr
-    account_number: str
-    new_password: str
-
-
-@router.post("/register")
-def register_user(req: RegisterRequest):
-    users_collection = db["users"]
-    accounts_collection = db["accounts"]
-
-    # Prevent duplicate user
-    existing = users_collection.find_one({
-        "$or": [
-            {"username": req.username},
-            {"email": req.email}
-        ]
-    })
-    if existing:
-        raise HTTPException(status_code=400, detail="User already exists")
-
-    # Insert user
-    result = users_collection.insert_one({
-        "username": req.username,
-        "email": req.email,
-        "password": req.password
-    })
-    user_id = str(result.inserted_id)
-
-    # Auto-create unique 8-digit savings account
-    while True:
-        acc_number = str(random.randint(10000000, 99999999))
-        if not accounts_collection.find_one({"account_number": acc_number}):
-            break
-
-    accounts_collection.insert_one({
-        "user_id": user_id,
-        "account_number": acc_number,
-        "account_type": "savings",
-        "balance": 0
-    })
-
-    return {
-        "status": "success",
-        "message": "User + Account created successfully 🚀",
-        "user": {
-            "user_id": user_id,
-            "username": req.username,
-            "email": req.email,
-            "account": {
-                "account_number": acc_number,
-                "account_type": "savings",
-                "balance": 0
-            }
-        }
-    }
-
-
-@router.post("/login")
-def login_user(req: LoginRequest):
-    users_collection = db["users"]
-    accounts_collection = db["accounts"]
-
-    user = users_collection.find_one({
-        "email": req.email,
-        "password": req.password
-    })
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid email or password")
-
-    account = accounts_collection.find_one({"user_id": str(user["_id"])})
-
-    return {
-        "status": "success",
-        "message": f"Welcome back, {user['username']} 🚀",
-        "user": {
-            "user_id": str(user["_id"]),
-            "username": user["username"],
-            "email": user["email"],
-            "account": {
-                "account_number": account["account_number"],
-                "account_type": account["account_type"],
-                "balance": account["balance"]
-            } if account else None
-        }
-    }
-
-
-@router.post("/forgot-password")
-def forgot_password(req: ForgotPasswordRequest):
-    users_collection = db["users"]
-    accounts_collection = db["accounts"]
-
-    # find user by email
-    user = users_collection.find_one({"email": req.email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # check that the provided account belongs to them
-    account = accounts_collection.find_one({
-        "user_id": str(user["_id"]),
-        "account_number": req.account_number
-    })
-    if not account:
-        raise HTTPException(status_code=400, detail="Email and account number do not match")
-
-    # update password
-    users_collection.update_one(
-        {"_id": user["_id"]},
-        {"$set": {"password": req.new_password}}
-    )
-
-    return {"status": "success", "message": "Password reset successful 🚀"}
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, EmailStr
+from app.db import db
+from app.lookups import LIVE
+from app.routes.accounts import create_account_doc
+from app.stats import bump
+from app.security.passwords import hash_password_async, verify_password_async, needs_rehash
+
+router = APIRouter()
+
+class RegisterRequest(BaseModel):
+    username: str
+    email: EmailStr
+    password: str
+
+class LoginRequest(BaseModel):
+    email: EmailStr
+    password: str
+
+class ForgotPasswordRequest(BaseModel):
+    email: EmailStr
+    account_number: str
+    new_password: str
+
+
+@router.post("/register")
+async def register_user(req: RegisterRequest):
+    users_collection = db["users"]
+
+    # Prevent duplicate user
+    existing = await users_collection.find_one({
+        "$or": [
+            {"username": req.username},
+            {"email": req.email}
+        ]
+    })
+    if existing:
+        raise HTTPException(status_code=400, detail="User already exists")
+
+    # Insert user
+    result = await users_collection.insert_one({
+        "username": req.username,
+        "email": req.email,
+        "password": await hash_password_async(req.password)
+    })
+    user_id = str(result.inserted_id)
+
+    # Auto-create unique 8-digit savings account
+    acc_number = await create_account_doc({
+        "user_id": result.inserted_id,
+        "account_type": "savings",
+        "balance": 0
+    })
+    await bump({"customers": 1, "accounts.total": 1, "accounts.savings.count": 1})
+
+    return {
+        "status": "success",
+        "message": "User + Account created successfully 🚀",
+        "user": {
+            "user_id": user_id,
+            "username": req.username,
+            "email": req.email,
+            "account": {
+                "account_number": acc_number,
+                "account_type": "savings",
+                "balance": 0
+            }
+        }
+    }
+
+
+@router.post("/login")
+async def login_user(req: LoginRequest):
+    users_collection = db["users"]
+    accounts_collection = db["accounts"]
+
+    user = await users_collection.find_one({"email": req.email, **LIVE})
+    stored = user and (user.get("password") or user.get("password_hash"))
+    if not user or not await verify_password_async(req.password, stored):
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+
+    # upgrade legacy plain-text (or low-cost) passwords now that we know the plain text
+    if needs_rehash(stored):
+        field = "password_hash" if "password_hash" in user else "password"
+        await users_collection.update_one(
+            {"_id": user["_id"]},
+            {"$set": {field: await hash_password_async(req.password)}}
+        )
+
+    account = await accounts_collection.find_one({"user_id": user["_id"], **LIVE})
+
+    return {
+        "status": "success",
+        "message": f"Welcome back, {user['username']} 🚀",
+        "user": {
+            "user_id": str(user["_id"]),
+            "username": user["username"],
+            "email": user["email"],
+            "account": {
+                "account_number": account["account_number"],
+                "account_type": account["account_type"],
+                "balance": account["balance"]
+            } if account else None
+        }
+    }
+
+
+@router.post("/forgot-password")
+async def forgot_password(req: ForgotPasswordRequest):
+    users_collection = db["users"]
+    accounts_collection = db["accounts"]
+
+    # find user by email
+    user = await users_collection.find_one({"email": req.email, **LIVE})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # check that the provided account belongs to them
+    account = await accounts_collection.find_one({
+        "user_id": user["_id"],
+        "account_number": req.account_number
+    })
+    if not account:
+        raise HTTPException(status_code=400, detail="Email and account number do not match")
+
+    # update password
+    await users_collection.update_one(
+        {"_id": user["_id"]},
+        {"$set": {"password": await hash_password_async(req.new_password)}, "$unset": {"password_hash": ""}}
+    )
+
+    return {"status": "success", "message": "Password reset successful 🚀"}
@@ -1,94 +1,180 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
-from bson import ObjectId
-from datetime import datetime
-from app.database import db
-
-router = APIRouter()
-
-# ---------- models ----------
-class EmiCalcRequest(BaseModel):
-    amount: float
-    annual_rate: float = Field(..., description="APR in %")
-    months: int
-
-class LoanApplyRequest(EmiCalcRequest):
-    user_id: str
-
-class PayEmiRequest(BaseModel):
-    user_id: str
-    loan_id: str
-    amount: float
-
-# ---------- helpers ----------
-def oid(s: str) -> ObjectId:
-    try:
-        return ObjectId((s or "").strip())
-    except Exception:
-        raise HTTPException(400, "Invalid id format")
-
-def calc_emi(p: float, apr: float, n: int) -> float:
-    r = (apr/100)/12
-    if r == 0:
-        return round(p / n, 2)
-    emi = p * r * (1 + r)**n / ((1 + r)**n - 1)
-    return round(emi, 2)
-
-def notify(user_oid: ObjectId, text: str):
-    db["messages"].insert_one({
-        "user_id": user_oid,
-        "text": text,
-        "created_at": datetime.utcnow()
-    })
-
-# ---------- endpoints ----------
-@router.post("/emi-calc")
-def emi_calc(req: EmiCalcRequest):
-    return {"emi": calc_emi(req.amount, req.annual_rate, req.months)}
-
-@router.post("/apply")
-def apply(req: LoanApplyRequest):
-    uoid = oid(req.user_id)
-    if not db["accounts"].find_one({"user_id": uoid}):
-        raise HTTPException(404, "Create a bank account first")
-
-    emi = calc_emi(req.amount, req.annual_rate, req.months)
-    doc = {
-        "user_id": uoid,
-        "amount": float(req.amount),
-        "annual_rate": float(req.annual_rate),
-        "months": int(req.months),
-        "emi": float(emi),
-        "status": "pending",
-        "emis_paid": 0,
-        "created_at": datetime.utcnow(),
-    }
-    res = db["loans"].insert_one(doc)
-    notify(uoid, f"Loan request submitted. EMI ≈ ₹{emi:.2f}")
-    return {"status":"success","loan_id": str(res.inserted_id), "emi": emi, "loan_status": "pending"}
-
-@router.get("/my/{user_id}")
-def my_loans(user_id: str):
-    uoid = oid(user_id)
-    rows = []
-    for l in db["loans"].find({"user_id": uoid}).sort("created_at",-1):
-        l["loan_id"] = str(l.pop("_id"))
-        l["user_id"] = str(l["user_id"])
-        rows.append(l)
-    return {"status":"success","loans": rows}
-
-@router.post("/pay-emi")
-def pay_emi(req: PayEmiRequest):
-    uoid, loid = oid(req.user_id), oid(req.loan_id)
-    loan = db["loans"].find_one({"_id": loid, "user_id": uoid})
-    if not loan: raise HTTPException(404, "Loan not found")
-    if loan["status"] != "approved": raise HTTPException(400, "Loan not approved")
-    # assume amount == EMI for now (simple)
-    db["loans"].update_one({"_id": loid}, {"$inc": {"emis_paid": 1}})
-    loan = db["loans"].find_one({"_id": loid})
-    if loan["emis_paid"] >= loan["months"]:
-        db["loans"].update_one({"_id": loid}, {"$set": {"status": "closed"}})
-        notify(uoid, "All EMIs paid. No Dues ✅")
-    else:
-        notify(uoid, f"EMI received: ₹{req.amount:.2f}. EMIs paid: {loan['emis_paid']}/{loan['months']}")
-    return {"status":"success","emis_paid": loan["emis_paid"], "months": loan["months"], "loan_status": loan.get("status","approved")}
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Annotated, List, Optional
+from pymongo import ReturnDocument
+from app.db import db
+from app.cache import invalidate_user
+from app.stats import acc_type, bump
+from app import ledger
+from app.ledger import tx_doc
+from app.amortization import emi_vector, schedule, schedule_matrix, schedule_rows
+from app.lookups import LIVE, oid
+from app.notifications import notify
+from app.responses import RAW, BSONResponse
+
+router = APIRouter()
+
+MAX_BATCH_SCHEDULES = 1000
+MAX_LOAN_MONTHS = 600   # bounds the (loans x max(months)) schedule matrices
+# with MAX_LOAN_MONTHS these keep p * r * (1 + r)**n far below float overflow
+MAX_ANNUAL_RATE = 100           # % APR
+MAX_LOAN_AMOUNT = 1e12
+
+# ---------- models ----------
+class EmiCalcRequest(BaseModel):
+    amount: float
+    annual_rate: float = Field(..., description="APR in %")
+    months: int
+
+class LoanApplyRequest(EmiCalcRequest):
+    user_id: str
+
+class EmiBatchRequest(BaseModel):
+    amounts: List[Annotated[float, Field(ge=0, le=MAX_LOAN_AMOUNT)]] = Field(..., min_length=1, max_length=200_000)
+    annual_rates: List[Annotated[float, Field(ge=0, le=MAX_ANNUAL_RATE)]]
+    months: List[Annotated[int, Field(ge=1, le=MAX_LOAN_MONTHS)]]
+    include_schedule: bool = False
+
+class PayEmiRequest(BaseModel):
+    user_id: str
+    loan_id: str
+    amount: Optional[float] = None     # optional: must match the instalment due
+
+# ---------- helpers ----------
+def calc_emi(p: float, apr: float, n: int) -> float:
+    r = (apr/100)/12
+    if r == 0:
+        return round(p / n, 2)
+    emi = p * r * (1 + r)**n / ((1 + r)**n - 1)
+    return round(emi, 2)
+
+def instalment_due(loan: dict) -> float:
+    """Amount of the instalment that takes the loan to its current `emis_paid`:
+    the EMI, except the last one, which settles the rounding residue."""
+    if loan["emis_paid"] < loan["months"]:
+        return float(loan["emi"])
+    return round(schedule(loan["amount"], loan["annual_rate"], loan["months"])[-1]["payment"], 2)
+
+# ---------- endpoints ----------
+@router.post("/emi-calc")
+async def emi_calc(req: EmiCalcRequest):
+    return {"emi": calc_emi(req.amount, req.annual_rate, req.months)}
+
+@router.post("/emi-calc/batch")
+async def emi_calc_batch(req: EmiBatchRequest):
+    """EMIs (and optionally full schedules) for a whole portfolio in one vectorized pass."""
+    n = len(req.amounts)
+    if len(req.annual_rates) != n or len(req.months) != n:
+        raise HTTPException(400, "amounts, annual_rates and months must have the same length")
+    if req.include_schedule and n > MAX_BATCH_SCHEDULES:
+        raise HTTPException(400, f"include_schedule is limited to {MAX_BATCH_SCHEDULES} loans per call")
+    if not req.include_schedule:
+        emis = emi_vector(req.amounts, req.annual_rates, req.months)
+        return {"status":"success","count": n, "emis": emis.tolist()}
+    emis, pay, intr, prin, bal = schedule_matrix(req.amounts, req.annual_rates, req.months)
+    return {"status":"success","count": n, "emis": emis.tolist(), "schedules": [
+        schedule_rows(pay[i], intr[i], prin[i], bal[i], req.months[i]) for i in range(n)
+    ]}
+
+@router.post("/apply")
+async def apply(req: LoanApplyRequest):
+    uoid = oid(req.user_id)
+    if not await db["accounts"].find_one({"user_id": uoid, **LIVE}):
+        raise HTTPException(404, "Create a bank account first")
+
+    emi = calc_emi(req.amount, req.annual_rate, req.months)
+    doc = {
+        "user_id": uoid,
+        "amount": float(req.amount),
+        "annual_rate": float(req.annual_rate),
+        "months": int(req.months),
+        "emi": float(emi),
+        "status": "pending",
+        "emis_paid": 0,
+        "created_at": datetime.utcnow(),
+    }
+    res = await db["loans"].insert_one(doc)
+    await bump({"loans.pending.count": 1, "loans.pending.amount": doc["amount"]})
+    await notify(uoid, f"Loan request submitted. EMI ≈ ₹{emi:.2f}")
+    return {"status":"success","loan_id": str(res.inserted_id), "emi": emi, "loan_status": "pending"}
+
+@router.get("/my/{user_id}")
+async def my_loans(user_id: str):
+    uoid = oid(user_id)
+    rows = await db["loans"].with_options(codec_options=RAW).aggregate([
+        {"$match": {"user_id": uoid}},
+        {"$sort": {"created_at": -1}},
+        {"$addFields": {"loan_id": "$_id"}},
+        {"$project": {"_id": 0}},
+    ]).to_list(None)
+    return BSONResponse({"status":"success","loans": rows})
+
+@router.get("/{loan_id}/schedule")
+async def loan_schedule(loan_id: str):
+    loan = await db["loans"].find_one({"_id": oid(loan_id)})
+    if not loan: raise HTTPException(404, "Loan not found")
+    rows = schedule(loan["amount"], loan["annual_rate"], loan["months"])
+    paid = int(loan.get("emis_paid", 0))
+    for row in rows:
+        row["paid"] = row["month"] <= paid
+    return {"status":"success","loan_id": loan_id, "emi": loan["emi"], "months": loan["months"],
+            "emis_paid": paid, "loan_status": loan["status"], "schedule": rows}
+
+@router.post("/pay-emi")
+async def pay_emi(req: PayEmiRequest):
+    """Pay one EMI: debit the account, advance the loan and log it in one transaction.
+
+    The loan update is a single conditional pipeline update: it only matches an
+    approved loan with emis_paid < months, increments emis_paid and flips status
+    to closed on the last instalment, so concurrent payments can neither overpay
+    nor skip the close. The account is debited the instalment due (see
+    instalment_due), never a client-chosen amount.
+    """
+    uoid, loid = oid(req.user_id), oid(req.loan_id)
+
+    async def run(session):
+        loan = await db["loans"].find_one_and_update(
+            {"_id": loid, "user_id": uoid, "status": "approved",
+             "$expr": {"$lt": ["$emis_paid", "$months"]}},
+            [
+                {"$set": {"emis_paid": {"$add": ["$emis_paid", 1]}}},
+                {"$set": {"status": {"$cond": [{"$gte": ["$emis_paid", "$months"]}, "closed", "$status"]}}},
+            ],
+            return_document=ReturnDocument.AFTER, session=session,
+        )
+        if not loan:
+            current = await db["loans"].find_one({"_id": loid, "user_id": uoid}, {"status": 1}, session=session)
+            if not current: raise HTTPException(404, "Loan not found")
+            if current["status"] == "closed": raise HTTPException(400, "Loan already closed")
+            raise HTTPException(400, "Loan not approved")
+        due = instalment_due(loan)
+        if req.amount is not None and abs(req.amount - due) >= 0.005:
+            raise HTTPException(400, f"Instalment due is ₹{due:.2f}")
+        acc = await db["accounts"].find_one_and_update(
+            {"user_id": uoid, **LIVE, "balance": {"$gte": due}},
+            {"$inc": {"balance": -due}},
+            return_document=ReturnDocument.AFTER, session=session,
+        )
+        if not acc:
+            if not await db["accounts"].find_one({"user_id": uoid, **LIVE}, {"_id": 1}, session=session):
+                raise HTTPException(404, "Account not found")
+            raise HTTPException(400, "Insufficient balance")
+        await ledger.record([tx_doc(uoid, "emi_payment", due, acc["balance"])], session=session)
+        return loan, acc, due
+
+    async with await db.client.start_session() as session:
+        loan, acc, due = await session.with_transaction(run)
+    invalidate_user(uoid)
+    inc = {"money.emi_payments.count": 1, "money.emi_payments.amount": due,
+           f"accounts.{acc_type(acc)}.balance": -due}
+    if loan["status"] == "closed":
+        inc.update({"loans.approved.count": -1, "loans.approved.amount": -loan["amount"],
+                    "loans.closed.count": 1, "loans.closed.amount": loan["amount"]})
+    await bump(inc)
+
+    if loan["status"] == "closed":
+        await notify(uoid, "All EMIs paid. No Dues ✅")
+    else:
+        await notify(uoid, f"EMI received: ₹{due:.2f}. EMIs paid: {loan['emis_paid']}/{loan['months']}")
+    return {"status":"success","amount": due,"emis_paid": loan["emis_paid"], "months": loan["months"], "loan_status": loan["status"]}
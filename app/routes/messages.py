@@ -1,18 +1,70 @@
-from fastapi import APIRouter
-from bson import ObjectId
-from app.database import db
-
-router = APIRouter()
-
-def oid(s: str) -> ObjectId:
-    from fastapi import HTTPException
-    try: return ObjectId((s or "").strip())
-    except Exception: raise HTTPException(400, "Invalid user_id format")
-
-@router.get("/{user_id}")
-def my_messages(user_id: str):
-    uoid = oid(user_id)
-    out=[]
-    for m in db["messages"].find({"user_id": uoid}).sort("created_at",-1):
-        m["_id"]=str(m["_id"]); m["user_id"]=str(m["user_id"]); out.append(m)
-    return {"count": len(out), "messages": out}
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from app.db import db
+from app.lookups import oid
+from app.notifications import broker
+from app.responses import RAW, BSONResponse, dumps
+import asyncio
+
+router = APIRouter()
+
+HEARTBEAT_SECONDS = 15
+
+@router.get("/{user_id}")
+async def my_messages(user_id: str, since: Optional[int] = None):
+    """All messages, newest first; with `since=<seq>` only the newer ones."""
+    uoid = oid(user_id, "user_id")
+    q = {"user_id": uoid}
+    if since is not None:
+        q["seq"] = {"$gt": since}
+    out = await db["messages"].with_options(codec_options=RAW).find(q).sort("seq",-1).to_list(None)
+    return BSONResponse({"count": len(out), "messages": out, "latest_seq": out[0]["seq"] if out else since})
+
+def sse(m: dict) -> str:
+    return f"id: {m['seq']}\nevent: message\ndata: {dumps(m).decode()}\n\n"
+
+@router.get("/{user_id}/stream")
+async def stream_messages(user_id: str, request: Request, since: Optional[int] = None,
+                          last_event_id: Optional[str] = Header(None)):
+    """Server-sent events: messages newer than `since` / Last-Event-ID, then live pushes.
+
+    Pushes only reach streams on the worker that stored the message, so the
+    stream reads everything newer than its last seq from Mongo on each push and
+    on each heartbeat: messages stored on other workers arrive at most
+    HEARTBEAT_SECONDS late.
+    """
+    uoid = oid(user_id, "user_id")
+    if last_event_id is not None:
+        if not last_event_id.isdigit():
+            raise HTTPException(400, "Invalid Last-Event-ID")
+        since = int(last_event_id)
+
+    async def events():
+        # subscribe before the catch-up read so nothing inserted in between is missed
+        # (messages are published only after they are stored, see app/notifications.py)
+        queue = broker.subscribe(uoid)
+        last = since
+        try:
+            if last is None:        # live only: start after the newest stored message
+                newest = await db["messages"].find_one({"user_id": uoid}, {"seq": 1}, sort=[("seq", -1)])
+                last = newest.get("seq", 0) if newest else 0
+            while True:
+                async for m in db["messages"].find({"user_id": uoid, "seq": {"$gt": last}}).sort("seq", 1):
+                    last = m["seq"]
+                    yield sse(m)
+                if await request.is_disconnected():
+                    return
+                # a push is only a wake-up: reading from Mongo keeps seq order even
+                # when another worker stored a message in between
+                try:
+                    await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                    while not queue.empty():
+                        queue.get_nowait()
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            broker.unsubscribe(uoid, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
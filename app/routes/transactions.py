@@ -1,131 +1,233 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from datetime import datetime
-from app.database import db
-from typing import Optional
-
-router = APIRouter()
-
-# ----- Models -----
-class DepositWithdraw(BaseModel):
-    user_id: Optional[str] = None
-    account_number: Optional[str] = None
-    amount: float
-
-class Transfer(BaseModel):
-    from_user_id: Optional[str] = None
-    to_user_id: Optional[str] = None
-    from_account: Optional[str] = None
-    to_account: Optional[str] = None
-    amount: float
-
-# ----- Helpers -----
-def find_account(user_id: Optional[str], account_number: Optional[str]):
-    if account_number:
-        acc = db["accounts"].find_one({"account_number": account_number})
-        if not acc:
-            raise HTTPException(404, "Account not found (by account_number)")
-        return acc
-
-    if user_id:
-        acc = db["accounts"].find_one({"user_id": user_id})
-        if not acc:
-            raise HTTPException(404, "Account not found (by user_id)")
-        return acc
-
-    raise HTTPException(400, "Provide either user_id or account_number")
-
-def log_tx(user_id: str, tx_type: str, amount: float, balance_after: float, counterparty: Optional[str] = None):
-    db["transactions"].insert_one({
-        "user_id": user_id,   # always a string
-        "type": tx_type,
-        "amount": float(amount),
-        "balance_after": float(balance_after),
-        "counterparty_user_id": counterparty,
-        "timestamp": datetime.utcnow(),
-    })
-
-# ----- Endpoints -----
-@router.post("/deposit")
-def deposit(req: DepositWithdraw):
-    if req.amount <= 0:
-        raise HTTPException(400, "Amount must be > 0")
-
-    acc = find_account(req.user_id, req.account_number)
-    db["accounts"].update_one({"_id": acc["_id"]}, {"$inc": {"balance": req.amount}})
-    new_acc = db["accounts"].find_one({"_id": acc["_id"]})
-
-    log_tx(new_acc["user_id"], "deposit", req.amount, new_acc["balance"])
-
-    return {
-        "status": "success",
-        "new_balance": float(new_acc["balance"]),
-        "account_number": new_acc["account_number"],
-    }
-
-@router.post("/withdraw")
-def withdraw(req: DepositWithdraw):
-    if req.amount <= 0:
-        raise HTTPException(400, "Amount must be > 0")
-
-    acc = find_account(req.user_id, req.account_number)
-    if float(acc["balance"]) < req.amount:
-        raise HTTPException(400, "Insufficient balance")
-
-    db["accounts"].update_one({"_id": acc["_id"]}, {"$inc": {"balance": -req.amount}})
-    new_acc = db["accounts"].find_one({"_id": acc["_id"]})
-
-    log_tx(new_acc["user_id"], "withdraw", req.amount, new_acc["balance"])
-
-    return {
-        "status": "success",
-        "new_balance": float(new_acc["balance"]),
-        "account_number": new_acc["account_number"],
-    }
-
-@router.post("/transfer")
-def transfer(req: Transfer):
-    if req.amount <= 0:
-        raise HTTPException(400, "Amount must be > 0")
-
-    from_acc = find_account(req.from_user_id, req.from_account)
-    to_acc   = find_account(req.to_user_id,   req.to_account)
-
-    if float(from_acc["balance"]) < req.amount:
-        raise HTTPException(400, "Insufficient balance")
-
-    db["accounts"].update_one({"_id": from_acc["_id"]}, {"$inc": {"balance": -req.amount}})
-    db["accounts"].update_one({"_id": to_acc["_id"]},   {"$inc": {"balance":  req.amount}})
-
-    new_from = db["accounts"].find_one({"_id": from_acc["_id"]})
-    new_to   = db["accounts"].find_one({"_id": to_acc["_id"]})
-
-    log_tx(new_from["user_id"], "transfer_out", req.amount, new_from["balance"], counterparty=new_to["user_id"])
-    log_tx(new_to["user_id"],   "transfer_in",  req.amount, new_to["balance"],   counterparty=new_from["user_id"])
-
-    return {
-        "status": "success",
-        "from_account_new_balance": float(new_from["balance"]),
-        "to_account_new_balance": float(new_to["balance"]),
-        "from_account_number": new_from["account_number"],
-        "to_account_number": new_to["account_number"],
-    }
-
-@router.get("/history/{user_id}")
-def history(user_id: str):
-    cur = db["transactions"].find({"user_id": user_id}).sort("timestamp", -1)
-    out = []
-    for t in cur:
-        row = {
-            "type": t["type"],
-            "amount": float(t["amount"]),
-            "balance_after": float(t["balance_after"]),
-            "timestamp": t["timestamp"].isoformat() + "Z",
-        }
-        if t.get("counterparty_user_id"):
-            if t["type"] == "transfer_out":
-                row["to"] = t["counterparty_user_id"]
-            elif t["type"] == "transfer_in":
-                row["from"] = t["counterparty_user_id"]
-        out.append(row)
-    return {"status": "success", "transactions": out}
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from bson import ObjectId
+from pydantic import BaseModel, Field
+from pymongo import ReturnDocument
+from datetime import datetime, timedelta
+from app.db import db
+from app.cache import invalidate_user
+from app.stats import acc_type, bump
+from app import transfers
+from app import ledger
+from app.ledger import tx_doc
+from app.lookups import LIVE, oid
+from app.pagination import encode_cursor, keyset_filter
+from app.responses import RAW, BSONResponse, dumps
+from typing import List, Optional
+
+router = APIRouter()
+
+# ----- Models -----
+class DepositWithdraw(BaseModel):
+    user_id: Optional[str] = None
+    account_number: Optional[str] = None
+    amount: float
+
+class Transfer(BaseModel):
+    from_user_id: Optional[str] = None
+    to_user_id: Optional[str] = None
+    from_account: Optional[str] = None
+    to_account: Optional[str] = None
+    amount: float
+
+class BatchTransferItem(BaseModel):
+    from_account: str
+    to_account: str
+    amount: float
+
+class BatchTransfer(BaseModel):
+    transfers: List[BatchTransferItem] = Field(..., min_length=1, max_length=50_000)
+
+# ----- Helpers -----
+def account_filter(user_id: Optional[str], account_number: Optional[str]) -> dict:
+    if account_number:
+        return {"account_number": str(account_number).strip(), **LIVE}
+    if user_id:
+        return {"user_id": oid(user_id, "user_id"), **LIVE}
+    raise HTTPException(400, "Provide either user_id or account_number")
+
+async def find_account(user_id: Optional[str], account_number: Optional[str], session=None):
+    acc = await db["accounts"].find_one(account_filter(user_id, account_number), session=session)
+    if not acc:
+        by = "account_number" if account_number else "user_id"
+        raise HTTPException(404, f"Account not found (by {by})")
+    return acc
+
+async def apply_balance_change(user_id: Optional[str], account_number: Optional[str], delta: float, tx_type: str):
+    """Atomically add `delta` to the balance, log it as `tx_type` and return the updated account.
+
+    Debits carry a `balance >= -delta` guard in the filter, so the overdraft check
+    and the write are one server-side operation and concurrent withdrawals cannot
+    both pass it. The balance update and its ledger row commit in one transaction,
+    so concurrent movements reach the ledger buckets in balance order. The extra
+    read only happens on the failure path, to tell "no such account" apart from
+    "insufficient balance".
+    """
+    q = account_filter(user_id, account_number)
+    if delta < 0:
+        q = {**q, "balance": {"$gte": -delta}}
+
+    async def run(session):
+        acc = await db["accounts"].find_one_and_update(
+            q, {"$inc": {"balance": delta}}, return_document=ReturnDocument.AFTER, session=session
+        )
+        if not acc:
+            await find_account(user_id, account_number, session=session)  # raises 404 if missing
+            raise HTTPException(400, "Insufficient balance")
+        await log_tx(acc["user_id"], tx_type, abs(delta), acc["balance"], session=session)
+        return acc
+
+    async with await db.client.start_session() as session:
+        return await session.with_transaction(run)
+
+async def log_tx(user_id: ObjectId, tx_type: str, amount: float, balance_after: float,
+                 counterparty: Optional[str] = None, session=None):
+    await ledger.record([tx_doc(user_id, tx_type, amount, balance_after, counterparty)], session=session)
+
+# ----- Endpoints -----
+@router.post("/deposit")
+async def deposit(req: DepositWithdraw):
+    if req.amount <= 0:
+        raise HTTPException(400, "Amount must be > 0")
+
+    new_acc = await apply_balance_change(req.user_id, req.account_number, req.amount, "deposit")
+    invalidate_user(new_acc["user_id"])
+    await bump({"money.deposits.count": 1, "money.deposits.amount": req.amount,
+                f"accounts.{acc_type(new_acc)}.balance": req.amount})
+
+    return {
+        "status": "success",
+        "new_balance": float(new_acc["balance"]),
+        "account_number": new_acc["account_number"],
+    }
+
+@router.post("/withdraw")
+async def withdraw(req: DepositWithdraw):
+    if req.amount <= 0:
+        raise HTTPException(400, "Amount must be > 0")
+
+    new_acc = await apply_balance_change(req.user_id, req.account_number, -req.amount, "withdraw")
+    invalidate_user(new_acc["user_id"])
+    await bump({"money.withdrawals.count": 1, "money.withdrawals.amount": req.amount,
+                f"accounts.{acc_type(new_acc)}.balance": -req.amount})
+
+    return {
+        "status": "success",
+        "new_balance": float(new_acc["balance"]),
+        "account_number": new_acc["account_number"],
+    }
+
+@router.post("/transfer")
+async def transfer(req: Transfer):
+    if req.amount <= 0:
+        raise HTTPException(400, "Amount must be > 0")
+
+    new_from, new_to = await transfers.transfer(
+        account_filter(req.from_user_id, req.from_account),
+        account_filter(req.to_user_id, req.to_account),
+        req.amount,
+    )
+    invalidate_user(new_from["user_id"])
+    invalidate_user(new_to["user_id"])
+    moved = {"money.transfers.count": 1, "money.transfers.amount": req.amount}
+    moved[f"accounts.{acc_type(new_from)}.balance"] = -req.amount
+    moved[f"accounts.{acc_type(new_to)}.balance"] = moved.get(f"accounts.{acc_type(new_to)}.balance", 0) + req.amount
+    await bump(moved)
+
+    return {
+        "status": "success",
+        "from_account_new_balance": float(new_from["balance"]),
+        "to_account_new_balance": float(new_to["balance"]),
+        "from_account_number": new_from["account_number"],
+        "to_account_number": new_to["account_number"],
+    }
+
+@router.post("/batch-transfer")
+async def batch_transfer(req: BatchTransfer):
+    """Apply many transfers (e.g. a payroll run) in chunked transactions.
+
+    Items are applied in order; each gets its own result so one bad row does
+    not fail the batch.
+    """
+    results = await transfers.batch_transfer([t.model_dump() for t in req.transfers])
+    ok = sum(r["status"] == "success" for r in results)
+    return {"status": "success", "applied": ok, "failed": len(results) - ok, "results": results}
+
+def _counterparty(tx_type: str):
+    return {"$cond": [
+        {"$and": [{"$eq": ["$type", tx_type]}, {"$ne": ["$counterparty_user_id", None]}]},
+        "$counterparty_user_id", "$$REMOVE",
+    ]}
+
+# History rows are shaped by Mongo and serialized as-is by app/responses.py.
+TX_VIEW = {"$project": {
+    "type": 1, "amount": 1, "balance_after": 1, "timestamp": 1,
+    "to": _counterparty("transfer_out"), "from": _counterparty("transfer_in"),
+}}
+
+@router.get("/history/{user_id}")
+async def history(
+    user_id: str,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    type: Optional[str] = Query(None, pattern="^(deposit|withdraw|transfer_in|transfer_out|emi_payment|interest|fee)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    stream: bool = False,
+):
+    """Newest-first history, keyset-paginated on (timestamp, _id).
+
+    Pass the returned `next_cursor` back as `cursor` for the next page. With
+    `stream=true` every matching row is written as NDJSON while the cursor yields
+    it (no limit, no paging), so memory stays flat for any history size.
+    """
+    q = {"user_id": oid(user_id, "user_id")}
+    if type:
+        q["type"] = type
+    if start or end:
+        q["timestamp"] = {}
+        if start: q["timestamp"]["$gte"] = start
+        if end:   q["timestamp"]["$lt"] = end
+    sort = {"$sort": {"timestamp": -1, "_id": -1}}
+    txs = db["transactions"].with_options(codec_options=RAW)
+
+    if stream:
+        async def ndjson():
+            async for t in txs.aggregate([{"$match": q}, sort, TX_VIEW], batchSize=1000):
+                yield dumps(t) + b"\n"
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    after = keyset_filter("timestamp", cursor)
+    match = {"$match": {"$and": [q, after]} if after else q}
+    docs = await txs.aggregate([match, sort, {"$limit": limit + 1}, TX_VIEW]).to_list(length=limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1]["timestamp"], docs[-1]["_id"])
+    return BSONResponse({"status": "success", "transactions": docs, "next_cursor": next_cursor})
+
+@router.get("/statement/{user_id}")
+async def statement(user_id: str, month: str = Query(..., pattern=r"^\d{4}-(0[1-9]|1[0-2])$")):
+    """Monthly statement from the ledger buckets (app/ledger.py): opening and
+    closing balance, totals and every movement, oldest first."""
+    uoid = oid(user_id, "user_id")
+    start, end = ledger.month_bounds(month)
+    end -= timedelta(microseconds=1)
+    bs = await ledger.buckets(uoid, start, end)
+    if not bs:
+        bal = await ledger.balance_as_of(uoid, end)
+        return {"status": "success", "month": month, "opening": bal, "closing": bal,
+                "credits": 0.0, "debits": 0.0, "count": 0, "entries": []}
+    entries = sorted((e for b in bs for e in b["entries"]), key=lambda e: (e["timestamp"], e["tx_id"]))
+    return BSONResponse({
+        "status": "success", "month": month,
+        "opening": bs[0]["opening"], "closing": ledger.closing(bs[-1]),
+        "credits": sum(b.get("credits", 0.0) for b in bs), "debits": sum(b.get("debits", 0.0) for b in bs),
+        "count": len(entries), "entries": entries,
+    })
+
+@router.get("/balance/{user_id}")
+async def balance_as_of(user_id: str, as_of: datetime):
+    """Balance at a point in time, read from at most one ledger bucket."""
+    return {"status": "success", "as_of": as_of,
+            "balance": await ledger.balance_as_of(oid(user_id, "user_id"), as_of)}
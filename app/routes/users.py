@@ -1,206 +1,242 @@
-# backend/app/routes/users.py
-from fastapi import APIRouter, HTTPException, Body
-from pydantic import BaseModel
-from typing import Optional
-from bson import ObjectId
-
-import os
-from uuid import uuid4
-from pathlib import Path
-from fastapi import UploadFile, File, Request
-
-
-from app.database import db
-from app.security.passwords import verify_password, hash_password
-
-# NOTE: main.py uses prefix="/users", so KEEP RELATIVE paths here.
-router = APIRouter()
-
-# ---------- helpers ----------
-def find_user_by_id_any(user_id: str):
-    """Find a user by _id that may be an ObjectId or a plain string."""
-    # try ObjectId
-    try:
-        u = db.users.find_one({"_id": ObjectId(user_id)})
-        if u:
-            return u
-    except Exception:
-        pass
-    # try plain string
-    return db.users.find_one({"_id": user_id})
-
-def find_user_by_account_number(acct_no: str):
-    """Find (user, account) tuple by account_number. Accepts str/int formats."""
-    acc = db.accounts.find_one({"account_number": str(acct_no)}) or db.accounts.find_one({"account_number": int(acct_no)}) if str(acct_no).isdigit() else None
-    if not acc:
-        return None, None
-    uid = acc.get("user_id")
-    # user_id in accounts may be stored as string; try both
-    u = find_user_by_id_any(str(uid))
-    return u, acc
-
-def verify_password_with_legacy_support(plain: str, stored: str) -> bool:
-    """Supports both bcrypt hashes and legacy plain text (if any existed)."""
-    if not stored:
-        return False
-    if isinstance(stored, str) and stored.startswith("$2"):  # bcrypt marker
-        try:
-            return verify_password(plain, stored)
-        except Exception:
-            return False
-    return plain == stored  # legacy fallback
-
-# ---------- models ----------
-class UserUpdate(BaseModel):
-    username: Optional[str] = None
-    dob: Optional[str] = None          # "YYYY-MM-DD"
-    phone: Optional[str] = None
-    address: Optional[str] = None
-    country: Optional[str] = None
-    language: Optional[str] = None
-    time_zone: Optional[str] = None
-    welcome: Optional[str] = None
-
-class PasswordChange(BaseModel):
-    old_password: str
-    new_password: str
-
-class AccountDelete(BaseModel):
-    current_password: str
-
-# ---------- endpoints by USER ID (back-compat) ----------
-@router.get("/{user_id}")
-def get_user(user_id: str):
-    u = find_user_by_id_any(user_id)
-    if not u:
-        raise HTTPException(404, detail="User not found")
-    uid_str = str(u["_id"])
-    acc = db.accounts.find_one({"user_id": uid_str}) or db.accounts.find_one({"user_id": u["_id"]})
-    return {
-        "status": "success",
-        "user": {
-            "id": uid_str,
-            "username": u.get("username"),
-            "email": u.get("email"),
-            "dob": u.get("dob"),
-            "phone": u.get("phone"),
-            "address": u.get("address"),
-            "country": u.get("country"),
-            "language": u.get("language"),
-            "time_zone": u.get("time_zone"),
-            "welcome": u.get("welcome"),
-            "created_at": u.get("created_at"),
-            "last_login": u.get("last_login"),
-        },
-        "account": acc and {
-            "account_number": acc.get("account_number"),
-            "balance": acc.get("balance", 0),
-        },
-    }
-
-@router.put("/{user_id}")
-def update_user(user_id: str, body: UserUpdate):
-    u = find_user_by_id_any(user_id)
-    if not u:
-        raise HTTPException(404, detail="User not found")
-    update = {k: v for k, v in body.model_dump().items() if v is not None}
-    if update:
-        db.users.update_one({"_id": u["_id"]}, {"$set": update})
-    return {"status": "success"}
-
-@router.put("/{user_id}/password")
-def change_password(user_id: str, payload: PasswordChange):
-    u = find_user_by_id_any(user_id)
-    if not u:
-        raise HTTPException(404, detail="User not found")
-    stored = u.get("password") or u.get("password_hash") or ""
-    if not verify_password_with_legacy_support(payload.old_password, stored):
-        raise HTTPException(status_code=400, detail="Old password incorrect")
-    new_hash = hash_password(payload.new_password)
-    field = "password_hash" if "password_hash" in u else "password"
-    db.users.update_one({"_id": u["_id"]}, {"$set": {field: new_hash}})
-    return {"status": "success"}
-
-@router.delete("/{user_id}")
-def delete_user(user_id: str, payload: AccountDelete = Body(...)):
-    u = find_user_by_id_any(user_id)
-    if not u:
-        raise HTTPException(404, detail="User not found")
-    stored = u.get("password") or u.get("password_hash") or ""
-    if not verify_password_with_legacy_support(payload.current_password, stored):
-        raise HTTPException(status_code=400, detail="Password incorrect")
-    uid_str = str(u["_id"])
-    db.transactions.delete_many({"user_id": uid_str})
-    db.accounts.delete_many({"user_id": uid_str})
-    db.users.delete_one({"_id": u["_id"]})
-    return {"status": "success"}
-
-# ---------- endpoints by ACCOUNT NUMBER (preferred) ----------
-@router.get("/by-account/{account_number}")
-def get_user_by_account(account_number: str):
-    u, acc = find_user_by_account_number(account_number)
-    if not u or not acc:
-        raise HTTPException(404, detail="Account or user not found")
-    uid_str = str(u["_id"])
-    return {
-        "status": "success",
-        "user": {
-            "id": uid_str,
-            "username": u.get("username"),
-            "email": u.get("email"),
-            "dob": u.get("dob"),
-            "phone": u.get("phone"),
-            "address": u.get("address"),
-            "country": u.get("country"),
-            "language": u.get("language"),
-            "time_zone": u.get("time_zone"),
-            "welcome": u.get("welcome"),
-            "created_at": u.get("created_at"),
-            "last_login": u.get("last_login"),
-        },
-        "account": {
-            "account_number": acc.get("account_number"),
-            "balance": acc.get("balance", 0),
-        },
-    }
-
-@router.put("/by-account/{account_number}")
-def update_user_by_account(account_number: str, body: UserUpdate):
-    u, acc = find_user_by_account_number(account_number)
-    if not u or not acc:
-        raise HTTPException(404, detail="Account or user not found")
-    update = {k: v for k, v in body.model_dump().items() if v is not None}
-    if update:
-        db.users.update_one({"_id": u["_id"]}, {"$set": update})
-    return {"status": "success"}
-
-@router.put("/by-account/{account_number}/password")
-def change_password_by_account(account_number: str, payload: PasswordChange):
-    u, acc = find_user_by_account_number(account_number)
-    if not u or not acc:
-        raise HTTPException(404, detail="Account or user not found")
-    stored = u.get("password") or u.get("password_hash") or ""
-    if not verify_password_with_legacy_support(payload.old_password, stored):
-        raise HTTPException(status_code=400, detail="Old password incorrect")
-    new_hash = hash_password(payload.new_password)
-    field = "password_hash" if "password_hash" in u else "password"
-    db.users.update_one({"_id": u["_id"]}, {"$set": {field: new_hash}})
-    return {"status": "success"}
-
-@router.delete("/by-account/{account_number}")
-def delete_by_account(account_number: str, payload: AccountDelete = Body(...)):
-    u, acc = find_user_by_account_number(account_number)
-    if not u or not acc:
-        raise HTTPException(404, detail="Account or user not found")
-    stored = u.get("password") or u.get("password_hash") or ""
-    if not verify_password_with_legacy_support(payload.current_password, stored):
-        raise HTTPException(status_code=400, detail="Password incorrect")
-    # delete transactions that involve this account number either side
-    an = str(acc.get("account_number"))
-    db.transactions.delete_many({"from_account": an})
-    db.transactions.delete_many({"to_account": an})
-    # delete account doc
-    db.accounts.delete_one({"account_number": an})
-    # if you want to delete the user entirely (single-account system):
-    db.users.delete_one({"_id": u["_id"]})
-    return {"status": "success"}
+# backend/app/routes/users.py
+from fastapi import APIRouter, HTTPException, Body, Request
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+from app.db import db
+from app.cache import cached_profile, invalidate_user
+from app.stats import acc_type, bump
+from app.lookups import LIVE, find_user, find_account_by_user, find_account_by_number
+from app.security.passwords import verify_password_async, hash_password_async
+from app import avatars, purge
+
+# NOTE: main.py uses prefix="/users", so KEEP RELATIVE paths here.
+router = APIRouter()
+
+# ---------- helpers ----------
+async def find_user_by_account_number(acct_no: str):
+    """Find (user, account) tuple by account_number: one account + one user query."""
+    acc = await find_account_by_number(acct_no)
+    if not acc:
+        return None, None
+    return await find_user(acc["user_id"]), acc
+
+def removal_stats(accs: list) -> dict:
+    """Counter decrements for a deleted customer and their accounts."""
+    inc = {"customers": -1, "accounts.total": -len(accs)}
+    for a in accs:
+        t = acc_type(a)
+        inc[f"accounts.{t}.count"] = inc.get(f"accounts.{t}.count", 0) - 1
+        inc[f"accounts.{t}.balance"] = inc.get(f"accounts.{t}.balance", 0) - float(a.get("balance", 0))
+    return inc
+
+async def close_customer(u: dict) -> str:
+    """Mark the user and their accounts deleted and record their purge job, in
+    one transaction: lookups treat them as gone at once, and everything
+    (account and user documents last) is deleted in the background
+    (app/purge.py). Returns the purge job id."""
+    now = datetime.utcnow()
+
+    async def run(session):
+        res = await db.users.update_one({"_id": u["_id"], **LIVE}, {"$set": {"deleted_at": now}}, session=session)
+        if not res.modified_count:
+            raise HTTPException(404, detail="User not found")    # closed concurrently
+        accs = await db.accounts.find({"user_id": u["_id"], **LIVE}, {"account_type": 1, "balance": 1},
+                                      session=session).to_list(None)
+        await db.accounts.update_many({"user_id": u["_id"]}, {"$set": {"deleted_at": now}}, session=session)
+        return accs, await purge.enqueue(u["_id"], session=session)
+
+    async with await db.client.start_session() as session:
+        accs, job_id = await session.with_transaction(run)
+    purge.queue.wake()
+    await bump(removal_stats(accs))
+    invalidate_user(u["_id"])
+    return str(job_id)
+
+async def set_avatar(u: dict, request: Request) -> dict:
+    """Stream the raw request body (image/*) into avatar storage and point the user at it."""
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > avatars.AVATAR_MAX_BYTES:
+        raise HTTPException(413, f"Avatar larger than {avatars.AVATAR_MAX_BYTES} bytes")
+    stored = await avatars.store(request.stream())
+    await db.users.update_one({"_id": u["_id"]}, {"$set": {
+        "avatar": stored["avatar"], "avatar_thumbnails": stored["thumbnails"],
+    }})
+    invalidate_user(u["_id"])
+    return {"status": "success", **stored}
+
+# ---------- models ----------
+class UserUpdate(BaseModel):
+    username: Optional[str] = None
+    dob: Optional[str] = None          # "YYYY-MM-DD"
+    phone: Optional[str] = None
+    address: Optional[str] = None
+    country: Optional[str] = None
+    language: Optional[str] = None
+    time_zone: Optional[str] = None
+    welcome: Optional[str] = None
+
+class PasswordChange(BaseModel):
+    old_password: str
+    new_password: str
+
+class AccountDelete(BaseModel):
+    current_password: str
+
+# ---------- endpoints by USER ID (back-compat) ----------
+@router.get("/{user_id}")
+async def get_user(user_id: str):
+    async def load():
+        u = await find_user(user_id)
+        if not u:
+            return None
+        uid_str = str(u["_id"])
+        acc = await find_account_by_user(u["_id"])
+        return uid_str, {
+            "status": "success",
+            "user": {
+                "id": uid_str,
+                "username": u.get("username"),
+                "email": u.get("email"),
+                "dob": u.get("dob"),
+                "phone": u.get("phone"),
+                "address": u.get("address"),
+                "country": u.get("country"),
+                "language": u.get("language"),
+                "time_zone": u.get("time_zone"),
+                "welcome": u.get("welcome"),
+                "created_at": u.get("created_at"),
+                "last_login": u.get("last_login"),
+                "avatar": u.get("avatar"),
+                "avatar_thumbnails": u.get("avatar_thumbnails"),
+            },
+            "account": acc and {
+                "account_number": acc.get("account_number"),
+                "balance": acc.get("balance", 0),
+            },
+        }
+
+    view = await cached_profile(("user", user_id), load)
+    if view is None:
+        raise HTTPException(404, detail="User not found")
+    return view
+
+@router.put("/{user_id}")
+async def update_user(user_id: str, body: UserUpdate):
+    u = await find_user(user_id)
+    if not u:
+        raise HTTPException(404, detail="User not found")
+    update = {k: v for k, v in body.model_dump().items() if v is not None}
+    if update:
+        await db.users.update_one({"_id": u["_id"]}, {"$set": update})
+        invalidate_user(u["_id"])
+    return {"status": "success"}
+
+@router.put("/{user_id}/password")
+async def change_password(user_id: str, payload: PasswordChange):
+    u = await find_user(user_id)
+    if not u:
+        raise HTTPException(404, detail="User not found")
+    stored = u.get("password") or u.get("password_hash") or ""
+    if not await verify_password_async(payload.old_password, stored):
+        raise HTTPException(status_code=400, detail="Old password incorrect")
+    new_hash = await hash_password_async(payload.new_password)
+    field = "password_hash" if "password_hash" in u else "password"
+    await db.users.update_one({"_id": u["_id"]}, {"$set": {field: new_hash}})
+    return {"status": "success"}
+
+@router.put("/{user_id}/avatar")
+async def upload_avatar(user_id: str, request: Request):
+    u = await find_user(user_id)
+    if not u:
+        raise HTTPException(404, detail="User not found")
+    return await set_avatar(u, request)
+
+@router.delete("/{user_id}")
+async def delete_user(user_id: str, payload: AccountDelete = Body(...)):
+    u = await find_user(user_id)
+    if not u:
+        raise HTTPException(404, detail="User not found")
+    stored = u.get("password") or u.get("password_hash") or ""
+    if not await verify_password_async(payload.current_password, stored):
+        raise HTTPException(status_code=400, detail="Password incorrect")
+    return {"status": "success", "purge_job_id": await close_customer(u)}
+
+# ---------- endpoints by ACCOUNT NUMBER (preferred) ----------
+@router.get("/by-account/{account_number}")
+async def get_user_by_account(account_number: str):
+    async def load():
+        u, acc = await find_user_by_account_number(account_number)
+        if not u or not acc:
+            return None
+        uid_str = str(u["_id"])
+        return uid_str, {
+            "status": "success",
+            "user": {
+                "id": uid_str,
+                "username": u.get("username"),
+                "email": u.get("email"),
+                "dob": u.get("dob"),
+                "phone": u.get("phone"),
+                "address": u.get("address"),
+                "country": u.get("country"),
+                "language": u.get("language"),
+                "time_zone": u.get("time_zone"),
+                "welcome": u.get("welcome"),
+                "created_at": u.get("created_at"),
+                "last_login": u.get("last_login"),
+                "avatar": u.get("avatar"),
+                "avatar_thumbnails": u.get("avatar_thumbnails"),
+            },
+            "account": {
+                "account_number": acc.get("account_number"),
+                "balance": acc.get("balance", 0),
+            },
+        }
+
+    view = await cached_profile(("account", account_number), load)
+    if view is None:
+        raise HTTPException(404, detail="Account or user not found")
+    return view
+
+@router.put("/by-account/{account_number}")
+async def update_user_by_account(account_number: str, body: UserUpdate):
+    u, acc = await find_user_by_account_number(account_number)
+    if not u or not acc:
+        raise HTTPException(404, detail="Account or user not found")
+    update = {k: v for k, v in body.model_dump().items() if v is not None}
+    if update:
+        await db.users.update_one({"_id": u["_id"]}, {"$set": update})
+        invalidate_user(u["_id"])
+    return {"status": "success"}
+
+@router.put("/by-account/{account_number}/password")
+async def change_password_by_account(account_number: str, payload: PasswordChange):
+    u, acc = await find_user_by_account_number(account_number)
+    if not u or not acc:
+        raise HTTPException(404, detail="Account or user not found")
+    stored = u.get("password") or u.get("password_hash") or ""
+    if not await verify_password_async(payload.old_password, stored):
+        raise HTTPException(status_code=400, detail="Old password incorrect")
+    new_hash = await hash_password_async(payload.new_password)
+    field = "password_hash" if "password_hash" in u else "password"
+    await db.users.update_one({"_id": u["_id"]}, {"$set": {field: new_hash}})
+    return {"status": "success"}
+
+@router.put("/by-account/{account_number}/avatar")
+async def upload_avatar_by_account(account_number: str, request: Request):
+    u, acc = await find_user_by_account_number(account_number)
+    if not u or not acc:
+        raise HTTPException(404, detail="Account or user not found")
+    return await set_avatar(u, request)
+
+@router.delete("/by-account/{account_number}")
+async def delete_by_account(account_number: str, payload: AccountDelete = Body(...)):
+    u, acc = await find_user_by_account_number(account_number)
+    if not u or not acc:
+        raise HTTPException(404, detail="Account or user not found")
+    stored = u.get("password") or u.get("password_hash") or ""
+    if not await verify_password_async(payload.current_password, stored):
+        raise HTTPException(status_code=400, detail="Password incorrect")
+    return {"status": "success", "purge_job_id": await close_customer(u)}
@@ -1,17 +1,78 @@
-# backend/app/security/passwords.py
-from passlib.context import CryptContext
-
-# using bcrypt (safe and widely supported)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def hash_password(password: str) -> str:
-    """
-    Hash a plain password and return the hash.
-    """
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """
-    Verify a plain password against its hash.
-    """
-    return pwd_context.verify(plain_password, hashed_password)
+# backend/app/security/passwords.py
+import asyncio
+import hmac
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from decouple import config
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = config("BCRYPT_ROUNDS", default=12, cast=int)
+# 0 = hash inline on the event loop (old behaviour, for benchmarks only)
+PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", default=os.cpu_count() or 1, cast=int)
+
+# using bcrypt (safe and widely supported)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+def hash_password(password: str) -> str:
+    """
+    Hash a plain password and return the hash.
+    """
+    return pwd_context.hash(password)
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a plain password against its hash.
+    """
+    return pwd_context.verify(plain_password, hashed_password)
+
+def is_hashed(stored: Optional[str]) -> bool:
+    return isinstance(stored, str) and stored.startswith("$2")  # bcrypt marker
+
+def needs_rehash(stored: Optional[str]) -> bool:
+    """True for legacy plain-text passwords and hashes below the current cost."""
+    return not is_hashed(stored) or pwd_context.needs_update(stored)
+
+# ---------- process-pool hashing service ----------
+# bcrypt is pure CPU (~250ms at cost 12). Running it on the event loop stalls every
+# request; a thread still contends for the GIL. A bounded process pool spreads a
+# login spike over all cores, and the semaphore caps how much work queues up.
+# Workers are spawned, not forked: they start lazily on the first hash, inside a
+# request, when Motor's executor threads may be holding locks a fork would copy.
+_pool: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+
+def start_hashing_pool() -> None:
+    global _pool, _slots
+    if PASSWORD_HASH_WORKERS > 0 and _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS,
+                                    mp_context=multiprocessing.get_context("spawn"))
+        _slots = asyncio.Semaphore(PASSWORD_HASH_WORKERS * 4)
+
+def stop_hashing_pool() -> None:
+    global _pool, _slots
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool, _slots = None, None
+
+async def _run(fn, *args):
+    if _pool is None:
+        return fn(*args)
+    async with _slots:
+        return await asyncio.get_running_loop().run_in_executor(_pool, fn, *args)
+
+async def hash_password_async(password: str) -> str:
+    return await _run(hash_password, password)
+
+async def verify_password_async(plain: str, stored: Optional[str]) -> bool:
+    """Verify against a bcrypt hash, or against a legacy plain-text password."""
+    if not stored:
+        return False
+    if is_hashed(stored):
+        try:
+            return await _run(verify_password, plain, stored)
+        except Exception:
+            return False
+    return hmac.compare_digest(plain.encode(), str(stored).encode())  # legacy fallback
@@ -0,0 +1,210 @@
+# backend/app/statements.py
+"""Bulk monthly statements (CSV, optionally PDF) for every account.
+
+POST /admin/statements starts a job for a month. The event loop walks
+`accounts` in _id order and hands each account to a process pool of
+STATEMENT_WORKERS; at most twice that many are in flight, so the account list
+is never held in memory. Each worker streams the account's month from
+`transactions` (user_id_timestamp_id index, one batch at a time) straight into
+the output file(s), so a busy account costs a cursor, not a list.
+
+Files are written to `<name>.tmp` and renamed into place, so a reader never sees
+a half-written statement, under static/statements/<token>/ where <token> is a
+random per-job directory name; GET /admin/statements/{job_id}/{account_number}
+redirects to the file on the /static mount. Progress (done/failed/total) is kept
+on the job document in `statement_jobs`.
+
+PDFs need reportlab; without it only CSV is offered.
+"""
+import asyncio
+import csv
+import logging
+import multiprocessing
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+from bson import ObjectId
+from decouple import config
+from pymongo import MongoClient
+
+from app.db import DB_NAME, MONGO_URL, client_options, db
+from app.ledger import SIGN, month_bounds
+from app.lookups import LIVE
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen.canvas import Canvas
+except ImportError:     # optional: CSV only
+    Canvas = None
+
+log = logging.getLogger(__name__)
+
+PDF_AVAILABLE = Canvas is not None
+STATEMENT_WORKERS = config("STATEMENT_WORKERS", default=os.cpu_count() or 1, cast=int)
+STATIC_DIR = Path("static")
+OUT_DIR = STATIC_DIR / "statements"
+HEADER = ["date", "type", "debit", "credit", "balance", "counterparty_user_id"]
+
+# ---------- worker side (runs in the pool processes) ----------
+_db = None
+
+
+def _init_worker() -> None:
+    global _db
+    _db = MongoClient(MONGO_URL, **{**client_options(), "maxPoolSize": 2, "minPoolSize": 0})[DB_NAME]
+
+
+class _PdfWriter:
+    """Minimal streaming table: one line per row, new page when the page is full."""
+
+    def __init__(self, path: str, title: str):
+        self.c = Canvas(path, pagesize=A4)
+        self.title = title
+        self._page()
+
+    def _page(self) -> None:
+        self.y = A4[1] - 50
+        self.c.setFont("Helvetica-Bold", 11)
+        self.c.drawString(40, self.y, self.title)
+        self.y -= 24
+        self.c.setFont("Helvetica", 8)
+
+    def row(self, values) -> None:
+        if self.y < 50:
+            self.c.showPage()
+            self._page()
+        for x, v in zip((40, 150, 240, 310, 380, 450), values):
+            self.c.drawString(x, self.y, str(v))
+        self.y -= 12
+
+    def close(self) -> None:
+        self.c.save()
+
+
+def render_account(account: dict, month: str, out_dir: str, pdf: bool) -> dict:
+    """Write one account's statement for `month`; returns its row count."""
+    start, end = month_bounds(month)
+    txs = _db["transactions"]
+    uid = account["user_id"]
+    prev = txs.find_one({"user_id": uid, "timestamp": {"$lt": start}}, {"balance_after": 1},
+                        sort=[("timestamp", -1), ("_id", -1)])
+    balance = prev["balance_after"] if prev else 0.0
+
+    base = os.path.join(out_dir, f"{account['account_number']}-{month}")
+    f = open(base + ".csv.tmp", "w", newline="")
+    out = csv.writer(f)
+    doc = _PdfWriter(base + ".pdf.tmp", f"Statement {month} - account {account['account_number']}") if pdf else None
+    rows = 0
+    try:
+        line = [start.date().isoformat(), "opening balance", "", "", f"{balance:.2f}", ""]
+        out.writerows([HEADER, line])
+        if doc:
+            doc.row(HEADER[:5])
+            doc.row(line[:5])
+        cursor = txs.find(
+            {"user_id": uid, "timestamp": {"$gte": start, "$lt": end}},
+            {"type": 1, "amount": 1, "balance_after": 1, "timestamp": 1, "counterparty_user_id": 1},
+        ).sort([("timestamp", 1), ("_id", 1)]).batch_size(1000)
+        for t in cursor:
+            amount = float(t["amount"])
+            debit = SIGN.get(t["type"], 1) < 0
+            balance = float(t["balance_after"])
+            line = [t["timestamp"].isoformat(sep=" ", timespec="seconds"), t["type"],
+                    f"{amount:.2f}" if debit else "", "" if debit else f"{amount:.2f}",
+                    f"{balance:.2f}", str(t.get("counterparty_user_id") or "")]
+            out.writerow(line)
+            if doc:
+                doc.row(line[:5])
+            rows += 1
+        line = [(end - timedelta(days=1)).date().isoformat(), "closing balance", "", "", f"{balance:.2f}", ""]
+        out.writerow(line)
+        if doc:
+            doc.row(line[:5])
+    except BaseException:
+        f.close()
+        for tmp in (base + ".csv.tmp", base + ".pdf.tmp"):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        raise
+    f.close()
+    if doc:
+        doc.close()
+    os.replace(base + ".csv.tmp", base + ".csv")
+    if doc:
+        os.replace(base + ".pdf.tmp", base + ".pdf")
+    return {"account_number": account["account_number"], "rows": rows}
+
+
+# ---------- job side (runs on the event loop) ----------
+_tasks: Dict[str, asyncio.Task] = {}
+
+
+async def create_job(month: str, pdf: bool = False) -> ObjectId:
+    token = secrets.token_urlsafe(16)
+    res = await db["statement_jobs"].insert_one({
+        "month": month, "pdf": pdf, "dir": token, "status": "queued",
+        "total": await db["accounts"].estimated_document_count(), "done": 0, "failed": 0, "rows": 0,
+        "created_at": datetime.utcnow(),
+    })
+    _tasks[str(res.inserted_id)] = asyncio.create_task(_run_logged(res.inserted_id))
+    return res.inserted_id
+
+
+async def _run_logged(job_id: ObjectId) -> None:
+    try:
+        await run_job(job_id)
+    except Exception as e:
+        log.exception("statement job %s failed", job_id)
+        await db["statement_jobs"].update_one({"_id": job_id}, {"$set": {"status": "failed", "error": str(e)}})
+
+
+async def run_job(job_id: ObjectId, workers: Optional[int] = None) -> None:
+    jobs = db["statement_jobs"]
+    job = await jobs.find_one({"_id": job_id})
+    out_dir = OUT_DIR / job["dir"]
+    out_dir.mkdir(parents=True, exist_ok=True)
+    await jobs.update_one({"_id": job_id}, {"$set": {"status": "running", "started_at": datetime.utcnow()}})
+
+    workers = workers or STATEMENT_WORKERS
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker)
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(workers * 2)
+    progress = {"done": 0, "failed": 0, "rows": 0}
+    pending = set()
+
+    async def one(acc):
+        try:
+            r = await loop.run_in_executor(pool, render_account, acc, job["month"], str(out_dir), job["pdf"])
+            progress["done"] += 1
+            progress["rows"] += r["rows"]
+        except Exception:
+            log.exception("statement for account %s failed", acc.get("account_number"))
+            progress["failed"] += 1
+        finally:
+            slots.release()
+
+    async def report():
+        await jobs.update_one({"_id": job_id}, {"$set": {**progress, "updated_at": datetime.utcnow()}})
+
+    try:
+        n = 0
+        async for acc in db["accounts"].find(LIVE, {"_id": 0, "user_id": 1, "account_number": 1}).sort("_id", 1):
+            await slots.acquire()
+            t = asyncio.create_task(one(acc))
+            pending.add(t)
+            t.add_done_callback(pending.discard)
+            n += 1
+            if n % 500 == 0:
+                await report()
+        if pending:
+            await asyncio.gather(*pending)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    await jobs.update_one({"_id": job_id}, {"$set": {
+        **progress, "total": n, "status": "done", "finished_at": datetime.utcnow(),
+    }})
@@ -0,0 +1,24 @@
+# backend/app/static.py
+"""The /static mount, with cache headers.
+
+StaticFiles already sends ETag / Last-Modified and answers If-None-Match with
+304. On top of that, files under IMMUTABLE_PREFIXES never change once written
+(avatars are named by content hash, see app/avatars.py), so they are marked
+`immutable` for a year and browsers stop revalidating them altogether.
+Everything else must revalidate (`no-cache`), which costs a 304, not a body.
+"""
+import os
+
+from starlette.staticfiles import StaticFiles
+
+IMMUTABLE_PREFIXES = ("avatars" + os.sep,)
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+class CachedStaticFiles(StaticFiles):
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        path = self.get_path(scope)
+        response.headers["cache-control"] = IMMUTABLE if path.startswith(IMMUTABLE_PREFIXES) else REVALIDATE
+        return response
@@ -0,0 +1,132 @@
+# backend/app/stats.py
+"""Incrementally maintained dashboard counters (GET /admin/stats).
+
+Every write path that changes a dashboard figure calls `bump()` with dotted
+`$inc` paths, e.g. {"money.deposits.count": 1, "accounts.savings.balance": 100}.
+To keep one hot document from serialising all deposits, increments go to one of
+STATS_SHARDS documents picked at random; reading sums the shards, which is O(1)
+in the size of the collections.
+
+Bumps happen after the business write commits, so a crash in between can leave
+a counter slightly off. `reconcile()` recomputes everything with aggregation
+pipelines, reports the drift and applies it as one more `bump()`, leaving the
+live shards (and any bumps landing meanwhile) alone. The pipelines and the
+shard read share one snapshot session, so a write committing mid-scan is either
+in both the recount and the counters or in neither (give or take its own bump,
+which lands just after it commits).
+Deleting a customer removes their ledger rows, so the `money.*` totals differ
+from the recomputed ones until the next reconcile; that drift is expected.
+
+
+    python -m app.stats reconcile
+"""
+import asyncio
+import random
+from datetime import datetime
+from typing import Dict
+
+from decouple import config
+
+from app.db import db
+from app.lookups import LIVE
+
+STATS_SHARDS = config("STATS_SHARDS", default=16, cast=int)
+TX_KEYS = {"deposit": "deposits", "withdraw": "withdrawals", "transfer_out": "transfers",
+           "emi_payment": "emi_payments", "interest": "interest", "fee": "fees"}
+
+
+def acc_type(acc: dict) -> str:
+    return acc.get("account_type") or "savings"
+
+
+async def bump(inc: Dict[str, float]) -> None:
+    inc = {k: v for k, v in inc.items() if v}
+    if inc:
+        shard = random.randrange(STATS_SHARDS)
+        await db["stats"].update_one({"_id": f"global:{shard}"}, {"$inc": inc}, upsert=True)
+
+
+def _merge(into: dict, d: dict) -> dict:
+    for k, v in d.items():
+        if isinstance(v, dict):
+            _merge(into.setdefault(k, {}), v)
+        elif isinstance(v, (int, float)):
+            into[k] = into.get(k, 0) + v
+    return into
+
+
+def _flatten(d: dict, prefix: str = "") -> Dict[str, float]:
+    out = {}
+    for k, v in d.items():
+        if isinstance(v, dict):
+            out.update(_flatten(v, f"{prefix}{k}."))
+        else:
+            out[f"{prefix}{k}"] = v
+    return out
+
+
+async def read_stats(session=None) -> dict:
+    total: dict = {}
+    async for s in db["stats"].find({"_id": {"$regex": "^global:"}}, session=session):
+        s.pop("_id")
+        _merge(total, s)
+    return total
+
+
+async def compute_stats(session=None) -> dict:
+    """The same figures, recomputed from the collections (O(collection))."""
+    true: Dict[str, float] = {"customers": await db["users"].count_documents(LIVE, session=session)}
+    async for g in db["accounts"].aggregate([
+        {"$match": LIVE},
+        {"$group": {"_id": {"$ifNull": ["$account_type", "savings"]}, "n": {"$sum": 1}, "bal": {"$sum": "$balance"}}},
+    ], session=session):
+        true[f"accounts.{g['_id']}.count"] = g["n"]
+        true[f"accounts.{g['_id']}.balance"] = g["bal"]
+    true["accounts.total"] = sum(v for k, v in true.items() if k.startswith("accounts.") and k.endswith(".count"))
+    async for g in db["transactions"].aggregate([
+        {"$match": {"type": {"$in": list(TX_KEYS)}}},
+        {"$group": {"_id": "$type", "n": {"$sum": 1}, "amt": {"$sum": "$amount"}}},
+    ], session=session):
+        true[f"money.{TX_KEYS[g['_id']]}.count"] = g["n"]
+        true[f"money.{TX_KEYS[g['_id']]}.amount"] = g["amt"]
+    async for g in db["loans"].aggregate([
+        {"$group": {"_id": "$status", "n": {"$sum": 1}, "amt": {"$sum": "$amount"}}},
+    ], session=session):
+        true[f"loans.{g['_id']}.count"] = g["n"]
+        true[f"loans.{g['_id']}.amount"] = g["amt"]
+    return true
+
+
+async def reconcile(apply: bool = True) -> dict:
+    """Rebuild counters from the collections and report what had drifted."""
+    async with await db.client.start_session(snapshot=True) as session:
+        true = await compute_stats(session)
+        counted = _flatten(await read_stats(session))
+    drift = {}
+    for k in sorted(set(true) | set(counted)):
+        t, c = true.get(k, 0), counted.get(k, 0)
+        if abs(t - c) > 1e-6:
+            drift[k] = {"counter": c, "actual": t, "diff": t - c}
+    if apply:
+        await bump({k: d["diff"] for k, d in drift.items()})
+        await db["stats"].update_one(
+            {"_id": "reconcile"}, {"$set": {"at": datetime.utcnow(), "drift_keys": len(drift)}}, upsert=True
+        )
+    return {"drift": drift, "checked": len(true)}
+
+
+if __name__ == "__main__":
+    import sys
+    from app.db import connect_db, close_db
+
+    async def _main():
+        connect_db()
+        try:
+            r = await reconcile(apply="--dry-run" not in sys.argv)
+        finally:
+            close_db()
+        for k, d in r["drift"].items():
+            print(f"{k:40} counter={d['counter']:>14} actual={d['actual']:>14} diff={d['diff']:>+14}")
+        print(f"{len(r['drift'])} of {r['checked']} figures drifted")
+
+    asyncio.run(_main())
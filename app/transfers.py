@@ -0,0 +1,140 @@
+# backend/app/transfers.py
+"""Transfer engine.
+
+`transfer` moves money between two accounts inside one client session /
+multi-document transaction: debit, credit and both ledger rows commit or abort
+together. `batch_transfer` applies thousands of transfers in chunks, each chunk
+being one transaction with a single `bulk_write` for balances and one
+`ledger.record` (an `insert_many` plus a bucket `bulk_write`) for the ledger.
+
+Transactions need a replica set (Atlas, or `mongod --replSet` locally).
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument, UpdateOne
+
+from app.cache import invalidate_user
+from app.db import db
+from app.stats import acc_type, bump
+from app import ledger
+from app.ledger import tx_doc
+from app.lookups import LIVE
+
+BATCH_CHUNK_SIZE = 500
+CHUNK_RETRIES = 3
+
+
+class _StaleChunk(Exception):
+    """A balance changed between the chunk's read and its bulk_write."""
+
+
+async def transfer(from_q: dict, to_q: dict, amount: float):
+    """Debit `from_q`, credit `to_q` and write both ledger rows atomically.
+
+    Returns (new_from, new_to). Raises HTTPException on missing accounts or
+    insufficient balance; nothing is written in that case.
+    """
+    if from_q == to_q:
+        raise HTTPException(400, "Cannot transfer to the same account")
+    accounts = db["accounts"]
+
+    async def run(session):
+        new_from = await accounts.find_one_and_update(
+            {**from_q, "balance": {"$gte": amount}},
+            {"$inc": {"balance": -amount}},
+            return_document=ReturnDocument.AFTER, session=session,
+        )
+        if not new_from:
+            if not await accounts.find_one(from_q, {"_id": 1}, session=session):
+                raise HTTPException(404, "Sender account not found")
+            raise HTTPException(400, "Insufficient balance")
+        new_to = await accounts.find_one_and_update(
+            to_q, {"$inc": {"balance": amount}},
+            return_document=ReturnDocument.AFTER, session=session,
+        )
+        if not new_to:
+            raise HTTPException(404, "Receiver account not found")
+        now = datetime.utcnow()
+        await ledger.record([
+            tx_doc(new_from["user_id"], "transfer_out", amount, new_from["balance"], new_to["user_id"], now),
+            tx_doc(new_to["user_id"], "transfer_in", amount, new_to["balance"], new_from["user_id"], now),
+        ], session=session)
+        return new_from, new_to
+
+    async with await db.client.start_session() as session:
+        return await session.with_transaction(run)
+
+
+async def _apply_chunk(items: List[dict]) -> List[dict]:
+    """Apply one chunk in a transaction; returns one result per item, in order."""
+    async def run(session):
+        numbers = {i["from_account"] for i in items} | {i["to_account"] for i in items}
+        snapshot = {}
+        async for a in db["accounts"].find({"account_number": {"$in": list(numbers)}, **LIVE}, session=session):
+            snapshot[a["account_number"]] = a
+        balances = {n: float(a["balance"]) for n, a in snapshot.items()}
+
+        results, rows, touched = [], [], set()
+        now = datetime.utcnow()
+        for i in items:
+            src, dst, amount = snapshot.get(i["from_account"]), snapshot.get(i["to_account"]), i["amount"]
+            if amount <= 0:
+                results.append({"status": "failed", "error": "Amount must be > 0"})
+            elif not src or not dst:
+                results.append({"status": "failed", "error": "Account not found"})
+            elif src is dst:
+                results.append({"status": "failed", "error": "Cannot transfer to the same account"})
+            elif balances[i["from_account"]] < amount:
+                results.append({"status": "failed", "error": "Insufficient balance"})
+            else:
+                balances[i["from_account"]] -= amount
+                balances[i["to_account"]] += amount
+                touched.update((i["from_account"], i["to_account"]))
+                rows.append(tx_doc(src["user_id"], "transfer_out", amount, balances[i["from_account"]], dst["user_id"], now))
+                rows.append(tx_doc(dst["user_id"], "transfer_in", amount, balances[i["to_account"]], src["user_id"], now))
+                results.append({"status": "success", "from_balance": balances[i["from_account"]]})
+
+        if touched:
+            # Guard on the balance we read: if anything moved it since, the chunk retries.
+            ops = [
+                UpdateOne({"_id": snapshot[n]["_id"], "balance": snapshot[n]["balance"]},
+                          {"$set": {"balance": balances[n]}})
+                for n in touched
+            ]
+            res = await db["accounts"].bulk_write(ops, ordered=False, session=session)
+            if res.matched_count != len(ops):
+                raise _StaleChunk()
+            await ledger.record(rows, session=session)
+        moved = {}
+        for n in touched:
+            key = f"accounts.{acc_type(snapshot[n])}.balance"
+            moved[key] = moved.get(key, 0) + balances[n] - float(snapshot[n]["balance"])
+        done = [i for i, r in zip(items, results) if r["status"] == "success"]
+        moved["money.transfers.count"] = len(done)
+        moved["money.transfers.amount"] = sum(i["amount"] for i in done)
+        return results, {snapshot[n]["user_id"] for n in touched}, moved
+
+    for attempt in range(CHUNK_RETRIES):
+        try:
+            async with await db.client.start_session() as session:
+                results, user_ids, moved = await session.with_transaction(run)
+            for uid in user_ids:
+                invalidate_user(uid)
+            await bump(moved)
+            return results
+        except _StaleChunk:
+            if attempt == CHUNK_RETRIES - 1:
+                return [{"status": "failed", "error": "Concurrent update, retry"} for _ in items]
+
+
+async def batch_transfer(items: List[dict], chunk_size: Optional[int] = None) -> List[dict]:
+    """Apply `items` ({from_account, to_account, amount}) in order, chunk by chunk."""
+    size = chunk_size or BATCH_CHUNK_SIZE
+    out = []
+    for start in range(0, len(items), size):
+        out.extend(await _apply_chunk(items[start:start + size]))
+    for idx, r in enumerate(out):
+        r["index"] = idx
+    return out
@@ -0,0 +1,20 @@
+"""Benchmarks; run each as `python -m benchmarks.<name>` from the repository root."""
+import os
+
+BENCH_SUFFIX = "_bench"
+
+
+def use_bench_db() -> str:
+    """Point the app at DB_NAME + "_bench" and return that name.
+
+    Call it before anything imports `app`: app/db.py reads DB_NAME at import
+    time, and the scripts drop that database before and after a run, so it must
+    never be the real one.
+    """
+    from decouple import config
+
+    name = config("DB_NAME", default="bank_management")
+    if not name.endswith(BENCH_SUFFIX):
+        name += BENCH_SUFFIX
+    os.environ["DB_NAME"] = name
+    return name
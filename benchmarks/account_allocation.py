@@ -0,0 +1,64 @@
+"""
+Registration latency vs. how full the account number space is.
+
+The allocator's cost depends only on its counter, so fill levels are simulated
+by moving `counters.account_number.seq`; no need to insert 81M accounts to see
+90%. For reference the old random-probe loop needs 1/(1 - fill) `find_one`s per
+registration on average (10 at 90%), growing without bound near 100%.
+
+Runs against DB_NAME + "_bench", dropped before and after the run, so the real
+counter and accounts are never touched.
+
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.account_allocation --per-level 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from benchmarks import use_bench_db
+
+LEVELS = [0.0, 0.25, 0.5, 0.75, 0.9]
+
+
+async def main(per_level: int):
+    from app import account_numbers
+    from app.db import DB_NAME, connect_db, close_db, db
+    from app.indexes import ensure_indexes
+    from main import app
+
+    await connect_db().client.drop_database(DB_NAME)
+    await ensure_indexes(db)
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+            for fill in LEVELS:
+                account_numbers._pool.clear()
+                await db["counters"].update_one(
+                    {"_id": "account_number"}, {"$set": {"seq": int(fill * account_numbers.SPACE)}}, upsert=True
+                )
+                lat = []
+                for i in range(per_level):
+                    email = f"bench-{fill}-{i}-{time.time_ns()}@example.com"
+                    t0 = time.perf_counter()
+                    r = await c.post("/auth/register", json={"username": email, "email": email, "password": "x"})
+                    lat.append((time.perf_counter() - t0) * 1000)
+                    r.raise_for_status()
+                lat.sort()
+                print(f"fill {fill:4.0%}: p50 {statistics.median(lat):6.2f} ms  "
+                      f"p99 {lat[int(len(lat) * 0.99) - 1]:6.2f} ms  "
+                      f"(old loop: ~{1 / (1 - fill):4.1f} probes)")
+    finally:
+        await db.client.drop_database(DB_NAME)
+        close_db()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--per-level", type=int, default=500)
+    args = p.parse_args()
+
+    use_bench_db()
+    asyncio.run(main(args.per_level))
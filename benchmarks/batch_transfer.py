@@ -0,0 +1,60 @@
+"""
+Transfers/sec: POST /transactions/transfer in a loop (today's payroll run) vs.
+one POST /transactions/batch-transfer.
+
+    MONGO_URL=mongodb://localhost:27017/?replicaSet=rs0 python -m benchmarks.batch_transfer --transfers 5000
+
+Transactions need a replica set; a single-node `mongod --replSet rs0` is enough.
+Runs against DB_NAME + "_bench", dropped before and after the run.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from bson import ObjectId
+
+from benchmarks import use_bench_db
+
+PAYER = "20000000"
+PAYEES = [str(20000001 + i) for i in range(100)]
+
+
+async def main(n: int):
+    from app.db import DB_NAME, connect_db, close_db, db
+    from main import app
+
+    await connect_db().client.drop_database(DB_NAME)
+    try:
+        await db["accounts"].insert_many(
+            [{"user_id": ObjectId(), "account_number": a, "account_type": "current", "balance": 1e12}
+             for a in [PAYER] + PAYEES]
+        )
+        items = [{"from_account": PAYER, "to_account": PAYEES[i % len(PAYEES)], "amount": 1.0} for i in range(n)]
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as c:
+            t0 = time.perf_counter()
+            for it in items:
+                (await c.post("/transactions/transfer", json=it)).raise_for_status()
+            loop_tps = n / (time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            r = await c.post("/transactions/batch-transfer", json={"transfers": items})
+            r.raise_for_status()
+            batch_tps = n / (time.perf_counter() - t0)
+    finally:
+        await db.client.drop_database(DB_NAME)
+        close_db()
+    print(f"single endpoint in a loop: {loop_tps:9.1f} transfers/s")
+    print(f"batch-transfer           : {batch_tps:9.1f} transfers/s  ({batch_tps / loop_tps:.1f}x), "
+          f"failed={r.json()['failed']}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--transfers", type=int, default=5000)
+    args = p.parse_args()
+
+    use_bench_db()
+    asyncio.run(main(args.transfers))
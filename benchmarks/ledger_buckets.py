@@ -0,0 +1,110 @@
+"""
+Flat `transactions` vs. monthly `ledger_buckets` (app/ledger.py): storage,
+index size, and monthly statement / as-of balance latency.
+
+Seeds `--users` x `--tx-per-user` ledger rows spread over `--months` months into
+DB_NAME + "_bench", builds the buckets with app.migrate_ledger, then times
+`--samples` random statements and as-of lookups against both layouts.
+
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.ledger_buckets --users 200 --tx-per-user 5000
+
+Needs a reachable MongoDB (collStats is not available in mongomock).
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import use_bench_db
+
+
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p / 100))]
+
+
+async def main(args):
+    from bson import ObjectId
+
+    from app import ledger, migrate_ledger
+    from app.db import DB_NAME, close_db, connect_db, db
+    from app.indexes import ensure_indexes
+
+    rng = random.Random(args.seed)
+    await connect_db().client.drop_database(DB_NAME)
+    await ensure_indexes(db)
+    try:
+        start = datetime(2025, 1, 1)
+        span = timedelta(days=30 * args.months).total_seconds()
+        users = [ObjectId() for _ in range(args.users)]
+        for u in users:
+            stamps = sorted(start + timedelta(seconds=rng.uniform(0, span)) for _ in range(args.tx_per_user))
+            bal, rows = 0.0, []
+            for ts in stamps:
+                kind = "deposit" if bal < 500 or rng.random() < 0.5 else "withdraw"
+                amt = round(rng.uniform(1, 500), 2)
+                bal += amt if kind == "deposit" else -amt
+                rows.append(ledger.tx_doc(u, kind, amt, bal, timestamp=ts))
+            await db["transactions"].insert_many(rows, ordered=False)
+
+        t0 = time.perf_counter()
+        report = migrate_ledger.run(restart=True)
+        print(f"migrate: {report} in {time.perf_counter() - t0:.1f}s")
+
+        for coll in ("transactions", "ledger_buckets"):
+            s = await db.command("collStats", coll)
+            print(f"{coll:15} docs {s['count']:>10}  data {s['size'] / 2**20:8.1f} MiB  "
+                  f"storage {s['storageSize'] / 2**20:8.1f} MiB  indexes {s['totalIndexSize'] / 2**20:8.1f} MiB")
+
+        async def flat_statement(u, y, m):
+            lo = datetime(y, m, 1)
+            hi = datetime(y + m // 12, m % 12 + 1, 1)
+            prev = await db["transactions"].find_one({"user_id": u, "timestamp": {"$lt": lo}},
+                                                     sort=[("timestamp", -1), ("_id", -1)])
+            rows = await db["transactions"].find({"user_id": u, "timestamp": {"$gte": lo, "$lt": hi}}) \
+                .sort([("timestamp", 1), ("_id", 1)]).to_list(length=None)
+            return (prev or {}).get("balance_after", 0.0), rows
+
+        async def bucket_statement(u, y, m):
+            lo = datetime(y, m, 1)
+            hi = datetime(y + m // 12, m % 12 + 1, 1) - timedelta(microseconds=1)
+            return await ledger.buckets(u, lo, hi)
+
+        async def flat_as_of(u, at):
+            t = await db["transactions"].find_one({"user_id": u, "timestamp": {"$lte": at}},
+                                                  sort=[("timestamp", -1), ("_id", -1)])
+            return t and t["balance_after"]
+
+        cases = {
+            "statement (flat)": lambda u, at: flat_statement(u, at.year, at.month),
+            "statement (buckets)": lambda u, at: bucket_statement(u, at.year, at.month),
+            "as-of (flat)": flat_as_of,
+            "as-of (buckets)": ledger.balance_as_of,
+        }
+        probes = [(rng.choice(users), start + timedelta(seconds=rng.uniform(0, span))) for _ in range(args.samples)]
+        for name, fn in cases.items():
+            lat = []
+            for u, at in probes:
+                t0 = time.perf_counter()
+                await fn(u, at)
+                lat.append((time.perf_counter() - t0) * 1000)
+            print(f"{name:20} p50 {pct(lat, 50):7.2f} ms  p99 {pct(lat, 99):7.2f} ms")
+    finally:
+        if not args.keep:
+            await db.client.drop_database(DB_NAME)
+        close_db()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--users", type=int, default=100)
+    p.add_argument("--tx-per-user", type=int, default=2000)
+    p.add_argument("--months", type=int, default=12)
+    p.add_argument("--samples", type=int, default=500)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--keep", action="store_true")
+    args = p.parse_args()
+
+    use_bench_db()
+    asyncio.run(main(args))
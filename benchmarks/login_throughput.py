@@ -0,0 +1,75 @@
+"""
+Login throughput at a fixed bcrypt cost.
+
+Seeds `--users` accounts hashed at BCRYPT_ROUNDS, then fires `--logins` concurrent
+POST /auth/login calls and reports logins/s plus the p99 of a cheap endpoint
+(GET /) measured during the spike, i.e. how much hashing starves other requests.
+Run it twice to compare inline hashing with the process pool:
+
+    BCRYPT_ROUNDS=12 PASSWORD_HASH_WORKERS=0 python -m benchmarks.login_throughput
+    BCRYPT_ROUNDS=12                         python -m benchmarks.login_throughput
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app.db import connect_db, close_db, db
+from app.security import passwords
+from main import app
+
+
+async def main(users: int, logins: int, concurrency: int):
+    connect_db()
+    passwords.start_hashing_pool()
+    try:
+        await db["users"].delete_many({"email": {"$regex": "^login-bench-"}})
+        hashed = await passwords.hash_password_async("secret")
+        await db["users"].insert_many(
+            [{"username": f"login-bench-{i}", "email": f"login-bench-{i}@example.com", "password": hashed}
+             for i in range(users)]
+        )
+
+        transport = httpx.ASGITransport(app=app)
+        sem = asyncio.Semaphore(concurrency)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as c:
+            async def login(i):
+                async with sem:
+                    r = await c.post("/auth/login", json={"email": f"login-bench-{i % users}@example.com",
+                                                          "password": "secret"})
+                    r.raise_for_status()
+
+            probe_lat, stop = [], asyncio.Event()
+
+            async def probe():
+                while not stop.is_set():
+                    t0 = time.perf_counter()
+                    await c.get("/")
+                    probe_lat.append((time.perf_counter() - t0) * 1000)
+                    await asyncio.sleep(0.01)
+
+            prober = asyncio.create_task(probe())
+            t0 = time.perf_counter()
+            await asyncio.gather(*(login(i) for i in range(logins)))
+            elapsed = time.perf_counter() - t0
+            stop.set()
+            await prober
+        await db["users"].delete_many({"email": {"$regex": "^login-bench-"}})
+    finally:
+        passwords.stop_hashing_pool()
+        close_db()
+
+    probe_lat.sort()
+    p99 = probe_lat[max(0, int(len(probe_lat) * 0.99) - 1)] if probe_lat else float("nan")
+    print(f"bcrypt rounds={passwords.BCRYPT_ROUNDS} workers={passwords.PASSWORD_HASH_WORKERS}: "
+          f"{logins / elapsed:7.1f} logins/s, GET / p99 during spike {p99:7.1f} ms")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--users", type=int, default=100)
+    p.add_argument("--logins", type=int, default=400)
+    p.add_argument("--concurrency", type=int, default=64)
+    args = p.parse_args()
+    asyncio.run(main(args.users, args.logins, args.concurrency))
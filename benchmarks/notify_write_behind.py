@@ -0,0 +1,98 @@
+"""
+pay-emi latency and Mongo round trips with and without the write-behind
+notification writer.
+
+    MONGO_URL=mongodb://localhost:27017/?replicaSet=rs0 python -m benchmarks.notify_write_behind --payments 2000
+
+pay-emi is a transaction, so this needs a replica set (a single-node
+`mongod --replSet rs0` is enough). Runs against DB_NAME + "_bench", dropped
+before and after the run.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+
+import httpx
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from benchmarks import use_bench_db
+
+ACC_NO = "90000001"
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.counts = Counter()
+
+    def started(self, event):
+        self.counts[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def run(write_behind: bool, payments: int, counter: CommandCounter) -> dict:
+    from app import db as appdb
+    from app.notifications import writer
+    from main import app
+
+    writer.write_behind = write_behind
+    uid = ObjectId()
+    # pay-emi debits the borrower's account: fund it for every instalment
+    await appdb.db["accounts"].insert_one(
+        {"user_id": uid, "account_number": ACC_NO, "account_type": "savings", "balance": float(payments)}
+    )
+    loan = await appdb.db["loans"].insert_one({
+        "user_id": uid, "amount": 1e6, "annual_rate": 10.0, "months": payments + 1, "emi": 1.0,
+        "status": "approved", "emis_paid": 0,
+    })
+    body = {"user_id": str(uid), "loan_id": str(loan.inserted_id), "amount": 1.0}
+
+    lat = []
+    writer.start()
+    counter.counts.clear()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        for _ in range(payments):
+            t0 = time.perf_counter()
+            (await c.post("/loans/pay-emi", json=body)).raise_for_status()
+            lat.append((time.perf_counter() - t0) * 1000)
+    await writer.stop()
+    ops = sum(counter.counts.values())
+    for coll in ("loans", "accounts", "messages", "transactions", "ledger_buckets"):
+        await appdb.db[coll].delete_many({"user_id": uid})
+    lat.sort()
+    return {"p50_ms": statistics.median(lat), "p99_ms": lat[int(len(lat) * 0.99) - 1],
+            "mongo_ops_per_request": ops / payments}
+
+
+async def main(payments: int):
+    from app import db as appdb
+
+    counter = CommandCounter()
+    appdb.client = AsyncIOMotorClient(appdb.MONGO_URL, event_listeners=[counter])
+    await appdb.client.drop_database(appdb.DB_NAME)
+    try:
+        for mode in (False, True):
+            r = await run(mode, payments, counter)
+            print(f"write_behind={str(mode):5}: p50 {r['p50_ms']:6.2f} ms  p99 {r['p99_ms']:6.2f} ms  "
+                  f"{r['mongo_ops_per_request']:.2f} mongo ops/request")
+    finally:
+        await appdb.client.drop_database(appdb.DB_NAME)
+        appdb.close_db()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--payments", type=int, default=2000)
+    args = p.parse_args()
+
+    use_bench_db()
+    asyncio.run(main(args.payments))
@@ -0,0 +1,74 @@
+"""
+Serialization cost of the admin accounts listing and transaction history:
+old per-row rewrite + jsonable_encoder + stdlib json vs. RawBSONDocument +
+orjson (app/responses.py). Documents are synthesized, so no database is needed.
+
+    python -m benchmarks.serialization --rows 100000
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+import bson
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from fastapi.encoders import jsonable_encoder
+
+from app.responses import dumps
+
+
+def accounts(n):
+    return [{"_id": ObjectId(), "user_id": ObjectId(), "account_number": str(10_000_000 + i),
+             "account_type": "savings", "balance": 1234.5} for i in range(n)]
+
+
+def transactions(n):
+    t0 = datetime(2026, 1, 1)
+    return [{"_id": ObjectId(), "user_id": ObjectId(), "type": "transfer_out", "amount": 10.0,
+             "balance_after": 100.0 + i, "counterparty_user_id": ObjectId(),
+             "timestamp": t0 + timedelta(seconds=i)} for i in range(n)]
+
+
+def old_accounts(docs):
+    out = []
+    for a in docs:
+        a = dict(a); a["_id"] = str(a["_id"]); a["user_id"] = str(a["user_id"]); out.append(a)
+    return json.dumps(jsonable_encoder({"count": len(out), "accounts": out})).encode()
+
+
+def old_history(docs):
+    out = []
+    for t in docs:
+        row = {"type": t["type"], "amount": float(t["amount"]), "balance_after": float(t["balance_after"]),
+               "timestamp": t["timestamp"].isoformat() + "Z", "to": str(t["counterparty_user_id"])}
+        out.append(row)
+    return json.dumps(jsonable_encoder({"status": "success", "transactions": out})).encode()
+
+
+def bench(label, fn, arg, repeat=3):
+    best = min(_time(fn, arg) for _ in range(repeat))
+    print(f"  {label:32} {best * 1000:9.1f} ms")
+    return best
+
+
+def _time(fn, arg):
+    t0 = time.perf_counter()
+    fn(arg)
+    return time.perf_counter() - t0
+
+
+def main(n):
+    for name, docs, old in (("admin/accounts", accounts(n), old_accounts),
+                            ("transactions/history", transactions(n), old_history)):
+        raw = [RawBSONDocument(bson.encode(d)) for d in docs]   # what the driver hands back
+        print(f"{name} ({n} rows)")
+        a = bench("dict rewrite + jsonable + json", old, docs)
+        b = bench("RawBSONDocument + orjson", lambda r: dumps({"count": len(r), "rows": r}), raw)
+        print(f"  speedup {a / b:.1f}x")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=100_000)
+    main(p.parse_args().rows)
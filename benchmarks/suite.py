@@ -0,0 +1,274 @@
+"""
+Reproducible end-to-end load benchmark.
+
+Seeds a throwaway database with `--users` users (one account each),
+`--tx-per-user` ledger rows, `--msgs-per-user` messages and `--loans` loans, then
+drives register, login, deposit, transfer, history, messages and the admin
+listings through the real app (lifespan included) at `--concurrency`, one
+endpoint at a time. Prints throughput and p50/p95/p99 per endpoint as JSON, so
+runs can be kept and diffed:
+
+    python -m benchmarks.suite --users 5000 --requests 2000 --concurrency 64 --out bench-$(git rev-parse --short HEAD).json
+    python -m benchmarks.suite --backend mock --users 200 --requests 200     # CI, no mongod
+
+--backend mongo connects with MONGO_URL / MONGO_MAX_POOL_SIZE / MONGO_MIN_POOL_SIZE
+(app/db.py) to DB_NAME + "_bench", which is dropped before seeding; point
+MONGO_URL at a local mongod, never at a shared cluster. --backend mock runs
+in-process on mongomock-motor (pip install mongomock-motor): it exercises the
+code paths for CI, and its numbers are only comparable with other mock runs.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import use_bench_db
+
+ENDPOINTS = ("register", "login", "deposit", "transfer", "history", "messages",
+             "admin_customers", "admin_accounts", "admin_loans")
+PASSWORD = "bench-secret"
+
+
+def mock_client():
+    """mongomock-motor client with the gaps the app hits papered over: no
+    sessions (transaction callbacks run without one), no RawBSONDocument codec
+    (with_options hands back plain dicts, which BSONResponse also takes), and
+    bulk_write ops from newer pymongo passing arguments (e.g. `sort`) that
+    mongomock's bulk builder doesn't take (they're dropped). The patches sit on
+    this client's databases and collections only, not on the mongomock classes."""
+    import inspect
+
+    from mongomock_motor import AsyncMongoMockClient
+
+    class _LenientBulk:
+        def __init__(self, bulk):
+            self._bulk = bulk
+
+        def __getattr__(self, name):
+            method = getattr(self._bulk, name)
+            known = set(inspect.signature(method).parameters)
+            return lambda *args, **kwargs: method(*args, **{k: v for k, v in kwargs.items() if k in known})
+
+    class _LenientOp:
+        def __init__(self, op):
+            self._op = op
+
+        def _add_to_bulk(self, bulk):
+            self._op._add_to_bulk(_LenientBulk(bulk))
+
+    def patch_collection(coll):
+        bulk_write = coll.bulk_write
+
+        async def lenient_bulk_write(requests, *args, **kwargs):
+            return await bulk_write([_LenientOp(op) for op in requests], *args, **kwargs)
+
+        coll.bulk_write = lenient_bulk_write
+        coll.with_options = lambda codec_options=None, **kw: coll
+        return coll
+
+    def patch_database(database):
+        get_collection = database.get_collection
+        database.get_collection = lambda *args, **kwargs: patch_collection(get_collection(*args, **kwargs))
+        return database
+
+    class _Session:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            pass
+
+        async def with_transaction(self, callback):
+            return await callback(None)
+
+        def __bool__(self):         # mongomock rejects any truthy session= argument
+            return False
+
+    async def start_session(*args, **kwargs):
+        return _Session()
+
+    client = AsyncMongoMockClient()
+    get_database = client.get_database
+    client.get_database = lambda *args, **kwargs: patch_database(get_database(*args, **kwargs))
+    client.start_session = start_session
+    return client
+
+
+def percentile(sorted_ms, p):
+    if not sorted_ms:
+        return None
+    return round(sorted_ms[min(len(sorted_ms) - 1, int(len(sorted_ms) * p / 100))], 3)
+
+
+async def seed(args, rng):
+    from bson import ObjectId
+
+    from app.account_numbers import next_account_number
+    from app.db import db
+    from app.ledger import tx_doc
+    from app.security.passwords import hash_password_async
+    from app.stats import reconcile
+
+    t0 = time.perf_counter()
+    hashed = await hash_password_async(PASSWORD)    # one hash; every seeded user shares it
+    users, accounts = [], []
+    for i in range(args.users):
+        uid = ObjectId()
+        users.append({"_id": uid, "username": f"bench-{i}", "email": f"bench-{i}@example.com", "password": hashed})
+        accounts.append({"user_id": uid, "account_number": await next_account_number(),
+                         "account_type": rng.choice(("savings", "current")), "balance": 1_000_000.0})
+
+    now = datetime.utcnow()
+    txs, msgs = [], []
+    for u in users:
+        for k in range(args.tx_per_user):
+            txs.append(tx_doc(u["_id"], rng.choice(("deposit", "withdraw")), 100.0, 1_000_000.0,
+                              timestamp=now - timedelta(minutes=k)))
+        for k in range(args.msgs_per_user):
+            msgs.append({"_id": ObjectId(), "seq": len(msgs) + 1, "user_id": u["_id"],
+                         "text": f"bench message {k}", "created_at": now - timedelta(minutes=k)})
+    loans = [{"user_id": rng.choice(users)["_id"], "amount": 100_000.0, "annual_rate": 10.0, "months": 24,
+              "emi": 4614.49, "status": rng.choice(("pending", "approved", "rejected")), "emis_paid": 0,
+              "created_at": now - timedelta(minutes=k)} for k in range(args.loans)]
+
+    for name, docs in (("users", users), ("accounts", accounts), ("transactions", txs),
+                       ("messages", msgs), ("loans", loans)):
+        for i in range(0, len(docs), 1000):
+            await db[name].insert_many(docs[i:i + 1000], ordered=False)
+    await db["counters"].update_one({"_id": "messages"}, {"$max": {"seq": len(msgs)}}, upsert=True)
+    await reconcile(apply=True)
+
+    counts = {"users": len(users), "transactions": len(txs), "messages": len(msgs), "loans": len(loans)}
+    return users, accounts, counts, time.perf_counter() - t0
+
+
+async def drive(client, make_request, n, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i):
+        nonlocal errors
+        method, url, body = make_request(i)
+        async with sem:
+            t0 = time.perf_counter()
+            r = await client.request(method, url, json=body)
+            elapsed = (time.perf_counter() - t0) * 1000
+        if r.status_code >= 400:
+            errors += 1
+        else:
+            latencies.append(elapsed)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    wall = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "requests": n, "errors": errors, "seconds": round(wall, 3),
+        "rps": round(len(latencies) / wall, 1) if wall else None,
+        "p50_ms": percentile(latencies, 50), "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99), "max_ms": percentile(latencies, 100),
+    }
+
+
+def requests_for(args, users, accounts, rng):
+    run = f"{int(time.time())}"
+    pick_user = lambda: rng.randrange(len(users))
+    return {
+        "register": lambda i: ("POST", "/auth/register", {
+            "username": f"bench-new-{run}-{i}", "email": f"bench-new-{run}-{i}@example.com", "password": PASSWORD}),
+        "login": lambda i: ("POST", "/auth/login", {"email": users[pick_user()]["email"], "password": PASSWORD}),
+        "deposit": lambda i: ("POST", "/transactions/deposit", {
+            "account_number": accounts[pick_user()]["account_number"], "amount": 10}),
+        "transfer": lambda i: ("POST", "/transactions/transfer", {
+            "from_account": accounts[i % len(accounts)]["account_number"],
+            "to_account": accounts[(i + 1 + rng.randrange(len(accounts) - 1)) % len(accounts)]["account_number"],
+            "amount": 1}),
+        "history": lambda i: ("GET", f"/transactions/history/{users[pick_user()]['_id']}?limit=50", None),
+        "messages": lambda i: ("GET", f"/messages/{users[pick_user()]['_id']}", None),
+        "admin_customers": lambda i: ("GET", f"/admin/customers?limit={args.page}", None),
+        "admin_accounts": lambda i: ("GET", f"/admin/accounts?limit={args.page}", None),
+        "admin_loans": lambda i: ("GET", f"/admin/loans?limit={args.page}", None),
+    }
+
+
+def git_rev():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args):
+    import httpx
+
+    import app.db as appdb
+    from app.indexes import ensure_indexes
+    from app.security import passwords
+    from main import app
+
+    if args.backend == "mock":
+        appdb.client = mock_client()
+
+    rng = random.Random(args.seed)
+    report = {"meta": {
+        "started_at": datetime.utcnow().isoformat() + "Z", "git": git_rev(), "backend": args.backend,
+        "db": appdb.DB_NAME, "pool": [appdb.MONGO_MIN_POOL_SIZE, appdb.MONGO_MAX_POOL_SIZE],
+        "bcrypt_rounds": passwords.BCRYPT_ROUNDS, "python": platform.python_version(),
+        "concurrency": args.concurrency, "requests": args.requests, "seed": args.seed,
+    }}
+
+    async with app.router.lifespan_context(app):
+        await appdb.client.drop_database(appdb.DB_NAME)
+        await ensure_indexes(appdb.connect_db())
+
+        users, accounts, counts, seconds = await seed(args, rng)
+        report["seed"] = {**counts, "seconds": round(seconds, 3)}
+        print(f"seeded {counts} in {seconds:.1f}s", file=sys.stderr)
+
+        reqs = requests_for(args, users, accounts, rng)
+        report["endpoints"] = {}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name in args.endpoints:
+                res = await drive(client, reqs[name], args.requests, args.concurrency)
+                report["endpoints"][name] = res
+                print(f"{name:16} {res['rps']:>9} req/s  p50 {res['p50_ms']} ms  p95 {res['p95_ms']} ms  "
+                      f"p99 {res['p99_ms']} ms  errors {res['errors']}", file=sys.stderr)
+
+        if not args.keep:
+            await appdb.client.drop_database(appdb.DB_NAME)
+
+    out = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(out + "\n")
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--backend", choices=("mongo", "mock"), default="mongo")
+    p.add_argument("--users", type=int, default=1000)
+    p.add_argument("--tx-per-user", type=int, default=50)
+    p.add_argument("--msgs-per-user", type=int, default=10)
+    p.add_argument("--loans", type=int, default=1000)
+    p.add_argument("--requests", type=int, default=1000, help="requests per endpoint")
+    p.add_argument("--concurrency", type=int, default=32)
+    p.add_argument("--page", type=int, default=100, help="limit for the admin listings")
+    p.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--keep", action="store_true", help="don't drop the bench database afterwards")
+    p.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = p.parse_args()
+    if args.users < 2:
+        p.error("--users must be at least 2 (transfers need two accounts)")
+
+    use_bench_db()
+    asyncio.run(run(args))
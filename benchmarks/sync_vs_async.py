@@ -0,0 +1,92 @@
+"""
+Requests/sec of the old blocking pymongo path vs. the async Motor path.
+
+Both apps serve the same hot query (account lookup by account_number) so the
+only difference is sync `def` + MongoClient in Starlette's threadpool vs.
+`async def` + the shared Motor client.
+
+    MONGO_URL=mongodb://localhost:27017 python -m benchmarks.sync_vs_async --requests 5000 --concurrency 200
+
+Needs a reachable MongoDB and `httpx`. Runs against DB_NAME + "_bench", dropped
+before and after the run.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from bson import ObjectId
+from fastapi import FastAPI
+from pymongo import MongoClient
+
+from benchmarks import use_bench_db
+
+ACC_NO = "10000001"
+
+
+def build_sync_app() -> FastAPI:
+    from app.db import MONGO_URL, DB_NAME, MONGO_MAX_POOL_SIZE
+
+    sync_db = MongoClient(MONGO_URL, maxPoolSize=MONGO_MAX_POOL_SIZE)[DB_NAME]
+    app = FastAPI()
+
+    @app.get("/acc/{acc_no}")
+    def get_acc(acc_no: str):
+        a = sync_db["accounts"].find_one({"account_number": acc_no}, {"_id": 0})
+        return {"balance": a and a["balance"]}
+
+    return app
+
+
+def build_async_app() -> FastAPI:
+    from app.db import db
+
+    app = FastAPI()
+
+    @app.get("/acc/{acc_no}")
+    async def get_acc(acc_no: str):
+        a = await db["accounts"].find_one({"account_number": acc_no}, {"_id": 0})
+        return {"balance": a and a["balance"]}
+
+    return app
+
+
+async def drive(app: FastAPI, total: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    sem = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        async def one():
+            async with sem:
+                r = await c.get(f"/acc/{ACC_NO}")
+                r.raise_for_status()
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return total / (time.perf_counter() - t0)
+
+
+async def main(total: int, concurrency: int):
+    from app.db import DB_NAME, connect_db, close_db, db
+
+    await connect_db().client.drop_database(DB_NAME)
+    try:
+        await db["accounts"].insert_one(
+            {"user_id": ObjectId(), "account_number": ACC_NO, "account_type": "savings", "balance": 0}
+        )
+        sync_rps = await drive(build_sync_app(), total, concurrency)
+        async_rps = await drive(build_async_app(), total, concurrency)
+    finally:
+        await db.client.drop_database(DB_NAME)
+        close_db()
+    print(f"sync  (pymongo + threadpool): {sync_rps:8.1f} req/s")
+    print(f"async (motor)               : {async_rps:8.1f} req/s  ({async_rps / sync_rps:.2f}x)")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--requests", type=int, default=5000)
+    p.add_argument("--concurrency", type=int, default=200)
+    args = p.parse_args()
+
+    use_bench_db()
+    asyncio.run(main(args.requests, args.concurrency))
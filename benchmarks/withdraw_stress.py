@@ -0,0 +1,69 @@
+"""
+Concurrency stress check for POST /transactions/withdraw.
+
+Seeds one account with `--balance`, fires `--parallel` simultaneous withdrawals
+of `--amount` through the real app, then checks that the balance never went
+negative and that exactly floor(balance / amount) withdrawals succeeded, each
+with one ledger row. Runs against DB_NAME + "_bench", dropped before and after.
+
+    MONGO_URL=mongodb://localhost:27017/?replicaSet=rs0 python -m benchmarks.withdraw_stress --parallel 500
+
+Withdrawals commit with their ledger row in a transaction, so this needs a
+replica set; a single-node `mongod --replSet rs0` is enough.
+"""
+import argparse
+import asyncio
+import sys
+
+import httpx
+from bson import ObjectId
+
+from benchmarks import use_bench_db
+
+ACC_NO = "10000002"
+USER_ID = ObjectId()
+
+
+async def main(balance: float, amount: float, parallel: int) -> int:
+    from app.db import DB_NAME, connect_db, close_db, db
+    from main import app
+
+    await connect_db().client.drop_database(DB_NAME)
+    try:
+        await db["accounts"].insert_one(
+            {"user_id": USER_ID, "account_number": ACC_NO, "account_type": "savings", "balance": balance}
+        )
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://stress") as c:
+            rs = await asyncio.gather(*(
+                c.post("/transactions/withdraw", json={"account_number": ACC_NO, "amount": amount})
+                for _ in range(parallel)
+            ))
+
+        ok = sum(r.status_code == 200 for r in rs)
+        rejected = sum(r.status_code == 400 for r in rs)
+        lowest = min((r.json()["new_balance"] for r in rs if r.status_code == 200), default=balance)
+        final = (await db["accounts"].find_one({"account_number": ACC_NO}))["balance"]
+        ledger = await db["transactions"].count_documents({"user_id": USER_ID, "type": "withdraw"})
+        expected = min(parallel, int(balance // amount))
+    finally:
+        await db.client.drop_database(DB_NAME)
+        close_db()
+
+    print(f"ok={ok} rejected={rejected} expected_ok={expected} final_balance={final} "
+          f"lowest_reported={lowest} ledger_rows={ledger}")
+    failed = final < 0 or lowest < 0 or ok != expected or ledger != ok or ok + rejected != parallel
+    print("FAIL" if failed else "PASS")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--balance", type=float, default=1000)
+    p.add_argument("--amount", type=float, default=7)
+    p.add_argument("--parallel", type=int, default=500)
+    args = p.parse_args()
+
+    use_bench_db()
+    sys.exit(asyncio.run(main(args.balance, args.amount, args.parallel)))
@@ -1,49 +1,102 @@
-# backend/main.py
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles  # 👈 add this
-
-from app.database import db
-from app.routes import auth, accounts, transactions, admin, loans, messages, users
-
-app = FastAPI(title="Bank Management App")
-
-# ----- CORS (React <-> FastAPI) -----
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        # "http://localhost:3000",
-        # "http://127.0.0.1:3000",
-        "*",
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# ----- Static files (for avatars, etc.) -----
-# Serve /static/* from the local "static" directory (create it if missing)
-# e.g. saved avatars at static/avatars/<file> will be accessible at /static/avatars/<file>
-app.mount("/static", StaticFiles(directory="static"), name="static")
-
-# ----- Routers -----
-app.include_router(auth.router,         prefix="/auth",         tags=["Auth"])
-app.include_router(users.router,        prefix="/users",        tags=["Users"])
-app.include_router(accounts.router,     prefix="/accounts",     tags=["Accounts"])
-app.include_router(transactions.router, prefix="/transactions", tags=["Transactions"])
-app.include_router(admin.router,        prefix="/admin",        tags=["Admin"])
-app.include_router(loans.router,        prefix="/loans",        tags=["Loans"])
-app.include_router(messages.router,     prefix="/messages",     tags=["Messages"])
-
-# ----- Health / Root -----
-@app.get("/")
-def home():
-    return {"message": "Welcome to Bank Management System 🚀"}
-
-@app.get("/test-db")
-def test_db():
-    try:
-        collections = db.list_collection_names()
-        return {"status": "success", "collections": collections}
-    except Exception as e:
-        return {"status": "failed", "error": str(e)}
+# backend/main.py
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.middleware.cors import CORSMiddleware
+
+from app import health
+from app.db import db, connect_db, close_db, warm_up
+from app.indexes import ensure_indexes
+from app.metrics import MetricsMiddleware, render as render_metrics
+from app.responses import BSONResponse
+from app.static import CachedStaticFiles
+from app.notifications import writer as notification_writer
+from app.purge import queue as purge_queue
+from app.security.passwords import start_hashing_pool, stop_hashing_pool
+from app.routes import auth, accounts, transactions, admin, loans, messages, users
+
+
+# ----- Lifespan: one shared Motor client per process -----
+# (pool size / timeouts / compressors come from MONGO_* settings, see app/db.py)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ensure_indexes(connect_db())
+    warmed = await warm_up()
+    start_hashing_pool()
+    notification_writer.start()
+    purge_queue.start()
+    health.mark_ready(warmed)
+    try:
+        yield
+    finally:
+        health.mark_stopping()
+        await purge_queue.stop()
+        await notification_writer.stop()
+        stop_hashing_pool()
+        close_db()
+
+app = FastAPI(title="Bank Management App", lifespan=lifespan, default_response_class=BSONResponse)
+
+# ----- CORS (React <-> FastAPI) -----
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=[
+        # "http://localhost:3000",
+        # "http://127.0.0.1:3000",
+        "*",
+    ],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# ----- Metrics (latency / status / Mongo commands per route) -----
+app.add_middleware(MetricsMiddleware)
+
+# ----- Static files (for avatars, etc.) -----
+# Serve /static/* from the local "static" directory (create it if missing)
+# e.g. saved avatars at static/avatars/<file> will be accessible at /static/avatars/<file>
+# (ETag + Cache-Control, avatars are immutable: see app/static.py)
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
+
+# ----- Routers -----
+app.include_router(auth.router,         prefix="/auth",         tags=["Auth"])
+app.include_router(users.router,        prefix="/users",        tags=["Users"])
+app.include_router(accounts.router,     prefix="/accounts",     tags=["Accounts"])
+app.include_router(transactions.router, prefix="/transactions", tags=["Transactions"])
+app.include_router(admin.router,        prefix="/admin",        tags=["Admin"])
+app.include_router(loans.router,        prefix="/loans",        tags=["Loans"])
+app.include_router(messages.router,     prefix="/messages",     tags=["Messages"])
+
+# ----- Health / Root -----
+@app.get("/")
+async def home():
+    return {"message": "Welcome to Bank Management System 🚀"}
+
+@app.get("/test-db")
+async def test_db():
+    try:
+        collections = await db.list_collection_names()
+        return {"status": "success", "collections": collections}
+    except Exception as e:
+        return {"status": "failed", "error": str(e)}
+
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    # liveness: the process is serving; never touches Mongo
+    return health.liveness()
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    # readiness: warmed up and Mongo answered a (cached) ping
+    body = await health.readiness()
+    return BSONResponse(body, status_code=200 if body["status"] == "ready" else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    text = render_metrics()
+    if health.state.startup_seconds is not None:
+        text += ("# HELP app_startup_seconds Seconds from process start to ready.\n"
+                 f"# TYPE app_startup_seconds gauge\napp_startup_seconds {health.state.startup_seconds}\n")
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")